@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class BaselayerConfig(AppConfig):
+    name = 'baselayer'
+
+    def ready(self):
+        from baselayer.db.sqlite import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas)
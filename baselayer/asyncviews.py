@@ -0,0 +1,106 @@
+"""Async counterparts of BaseAPIView for ASGI deployments.
+
+Django 3.2 has no async ORM and DRF 3.12 has no async views, so
+``AsyncBaseAPIView`` runs DRF's request cycle on the event loop and hands
+database work to ``database_sync_to_async``: a bounded pool of threads
+that, unlike Django's thread sensitive executor, serve many requests at
+once. Authentication uses ``authenticate_async`` where the authenticator
+provides it.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import exceptions
+
+from baselayer.baseapiviews import BaseAPIView
+from baselayer.db.routers import read_from
+
+_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DATABASE_WORKERS, thread_name_prefix="async-db")
+
+
+def database_sync_to_async(func):
+    """Run a sync function that uses the database on the async database pool."""
+
+    @functools.wraps(func)
+    def run_with_connection(*args, **kwargs):
+        # Pool threads keep their connections; honour CONN_MAX_AGE like a request would.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run_with_connection, thread_sensitive=False, executor=_executor)
+
+
+class AsyncBaseAPIView(BaseAPIView):
+    """BaseAPIView whose handlers may be ``async def``.
+    Sync handlers (e.g. inherited post/delete) run on the database pool.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        functools.update_wrapper(async_view, view)
+        async_view.csrf_exempt = True
+        return async_view
+
+    async def perform_authentication_async(self, request):
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, "authenticate_async", None)
+            try:
+                if authenticate is not None:
+                    user_auth_tuple = await authenticate(request)
+                else:
+                    user_auth_tuple = await database_sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.perform_authentication_async(request)
+            # request.user is set, so this only checks permissions and throttles,
+            # which may still query the database. It runs in a context of its
+            # own: sync_to_async copies context changes back to the caller, and
+            # the read database initial() sets is applied around the handler.
+            await database_sync_to_async(contextvars.copy_context().run)(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # Read database picked by ReplicaReadMixin.initial(), if any.
+            with read_from(getattr(self, "read_database", None)):
+                if asyncio.iscoroutinefunction(handler):
+                    response = await handler(request, *args, **kwargs)
+                else:
+                    response = await database_sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        # Rendered here so Django's handler has nothing left to do on its sync thread.
+        return self.response.render()
@@ -4,10 +4,13 @@ import logging
 
 from django.conf import settings
 from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.status import is_server_error
 from rest_framework.views import APIView, exception_handler
 
+from baselayer.db.routers import is_pinned_to_primary, read_from, set_read_database
+
 logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
 
 
@@ -84,6 +87,13 @@ class BaseAPIView(APIView):
             message=message,
         )
 
+    def send_service_unavailable_response(self, message):
+        """compose response for a temporarily failing dependency; the message
+        is kept, unlike other server errors
+        """
+        return Response(data=self.make_response_body(False, None, message),
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
     def successful_call(self, response):
         return response.status_code == status.HTTP_200_OK
 
@@ -99,6 +109,29 @@ class BaseAPIView(APIView):
         return response
 
 
+class ReplicaReadMixin:
+    """Serve safe requests from the read replica, see baselayer/db/routers.py"""
+
+    # Picked by initial(); AsyncBaseAPIView runs the handler with it.
+    read_database = None
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permissions still read from the primary.
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and settings.REPLICA_DATABASE
+            and not is_pinned_to_primary(request.user.pk)
+        ):
+            self.read_database = settings.REPLICA_DATABASE
+            set_read_database(self.read_database)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Resets what initial() set, in the context dispatch runs in.
+        with read_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+
 def custom_exception_handler(exc, context):
     """Call REST framework's default exception handler to set a standard error response on error."""
     logger.info("inside of custom exception handler.")
@@ -1,4 +1,10 @@
+import copy
 import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
 import jwt
 
 from django.conf import settings
@@ -7,6 +13,11 @@ from django.views.decorators.csrf import csrf_exempt
 from rest_framework import exceptions
 from rest_framework.authentication import BaseAuthentication
 
+from baselayer.tokenrevocation import revocation_list
+
+ACCESS_TOKEN = 'access'
+REFRESH_TOKEN = 'refresh'
+
 
 class CSRFCheck(CsrfViewMiddleware):
     def _reject(self, request, reason):
@@ -14,6 +25,100 @@ class CSRFCheck(CsrfViewMiddleware):
         return reason
 
 
+class UserCache:
+    """Bounded LRU cache of authenticated users with a TTL, local to the process.
+
+    Entries are keyed by user id. Users are dropped on save (see
+    users/signals.py), other processes notice changes within the TTL.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # user id -> (expires_at, user)
+        self.users = OrderedDict()
+
+    def get(self, user_id):
+        """Copy of the cached user, None on a miss"""
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self.users[user_id]
+                return None
+            self.users.move_to_end(user_id)
+        # Every request gets its own instance, the cached one is never handed out.
+        return copy.copy(user)
+
+    def set(self, user):
+        with self.lock:
+            self.users[str(user.id)] = (time.monotonic() + self.ttl, copy.copy(user))
+            self.users.move_to_end(str(user.id))
+            while len(self.users) > self.max_size:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def decode_token(token, token_type, check_revoked=True):
+    """Verify a token's signature, expiry, type and revocation.
+    :return the payload
+    :raise AuthenticationFailed
+    """
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=['HS256'], options={'require': ['exp', 'jti', 'user_id']}
+        )
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token expired')
+    except jwt.InvalidTokenError:
+        raise exceptions.NotAcceptable('Invalid token')
+    if payload.get('type') != token_type:
+        raise exceptions.AuthenticationFailed('Invalid token type')
+    if check_revoked and revocation_list.is_revoked(payload['jti']):
+        raise exceptions.AuthenticationFailed('Token revoked')
+    return payload
+
+
+def token_matches_user(payload, user):
+    """False for tokens issued before the user's phone number changed or
+    before their tokens were invalidated (see User.invalidate_tokens)
+    """
+    return (
+        user.phone_number == payload['phone_number']
+        # Tokens issued before versioning carry no version, i.e. version 0.
+        and user.token_version == payload.get('token_version', 0)
+    )
+
+
+def get_token_user(payload):
+    """User of a decoded token, from the cache or by primary key.
+    Outdated tokens (see token_matches_user) resolve to no user.
+    """
+    from users.models import User
+    user = user_cache.get(payload['user_id'])
+    if user is None:
+        user = User.objects.filter(pk=payload['user_id']).first()
+        if user is None:
+            return None
+        user_cache.set(user)
+    if not token_matches_user(payload, user):
+        return None
+    return user
+
+
 class JWTAuthentication(BaseAuthentication):
     """
         custom authentication class for DRF and JWT
@@ -29,29 +134,69 @@ class JWTAuthentication(BaseAuthentication):
             return None
         try:
             access_token = authorization_header.split(' ')[1]
-            payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=['HS256'])
+        except IndexError:
+            raise exceptions.AuthenticationFailed('Token prefix missing')
+        payload = decode_token(access_token, ACCESS_TOKEN)
+
+        user = get_token_user(payload)
+        if user is None:
+            raise exceptions.AuthenticationFailed('User not found')
 
+        # request.auth holds the token payload, e.g. to revoke it.
+        return user, payload
+
+    async def authenticate_async(self, request):
+        """authenticate() for async views; the database is only queried on a
+        user cache miss or when the revocation filter needs it
+        """
+        from baselayer.asyncviews import database_sync_to_async
+
+        authorization_header = request.headers.get('Authorization')
+
+        if not authorization_header:
+            return None
+        try:
+            access_token = authorization_header.split(' ')[1]
         except IndexError:
             raise exceptions.AuthenticationFailed('Token prefix missing')
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Token expired')
-        except jwt.InvalidTokenError:
-            raise exceptions.NotAcceptable('Invalid token')
+        payload = decode_token(access_token, ACCESS_TOKEN, check_revoked=False)
+        if revocation_list.needs_database(payload['jti']):
+            if await database_sync_to_async(revocation_list.is_revoked)(payload['jti']):
+                raise exceptions.AuthenticationFailed('Token revoked')
 
-        from users.models import User
-        user = User.objects.filter(phone_number=payload['phone_number']).first()
+        user = user_cache.get(payload['user_id'])
+        if user is None:
+            user = await database_sync_to_async(get_token_user)(payload)
+        elif not token_matches_user(payload, user):
+            user = None
         if user is None:
             raise exceptions.AuthenticationFailed('User not found')
 
-        return user, None
+        return user, payload
 
 
-def generate_access_token(user):
-    access_token_payload = {
+def generate_token(user, token_type, lifetime):
+    now = datetime.datetime.utcnow()
+    token_payload = {
+        'type': token_type,
+        'jti': uuid.uuid4().hex,
+        'user_id': str(user.id),
         'email': user.email,
         'phone_number': user.phone_number,
-        'iat': datetime.datetime.utcnow(),
+        'token_version': user.token_version,
+        'iat': now,
+        'exp': now + datetime.timedelta(seconds=lifetime),
     }
-    encoded_token = jwt.encode(access_token_payload, settings.SECRET_KEY, algorithm='HS256')
-    # access_token = encoded_token.decode('utf-8')
-    return encoded_token
+    return jwt.encode(token_payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def generate_access_token(user):
+    return generate_token(user, ACCESS_TOKEN, settings.ACCESS_TOKEN_LIFETIME_SECONDS)
+
+
+def generate_refresh_token(user):
+    return generate_token(user, REFRESH_TOKEN, settings.REFRESH_TOKEN_LIFETIME_SECONDS)
+
+
+def revoke_token(payload):
+    revocation_list.revoke(payload)
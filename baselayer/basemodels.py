@@ -1,19 +1,87 @@
+import os
+import threading
+import time
 import uuid
 
 from django.db import models
+from django.dispatch import Signal
+from django.utils import timezone
+
+_uuid7_lock = threading.Lock()
+_uuid7_last_timestamp = 0
+_uuid7_counter = 0
+
+
+def uuid7():
+    """Time-ordered UUID (RFC 9562 version 7): a millisecond timestamp, a
+    12 bit counter keeping ids monotonic within the process, random bits.
+    New rows are appended at the end of the primary key index instead of
+    landing at random positions.
+    """
+    global _uuid7_last_timestamp, _uuid7_counter
+    with _uuid7_lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp > _uuid7_last_timestamp:
+            # Random start with the top bit clear leaves room to count up.
+            _uuid7_counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            timestamp = _uuid7_last_timestamp
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                timestamp += 1
+                _uuid7_counter = 0
+        _uuid7_last_timestamp = timestamp
+        counter = _uuid7_counter
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=timestamp << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random_bits)
+
+
+# Sent by SoftDeleteQuerySet.soft_delete(), which saves no instances and so
+# sends no post_save, with the model as sender and the flagged primary keys.
+post_soft_delete = Signal()
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def soft_delete(self):
+        """Flag the rows as deleted in one UPDATE and send post_soft_delete."""
+        pks = list(self.filter(is_deleted=False).values_list("pk", flat=True))
+        if not pks:
+            return 0
+        updated = self.model._base_manager.using(self.db).filter(pk__in=pks).update(
+            is_deleted=True, modified_at=timezone.now()
+        )
+        post_soft_delete.send(sender=self.model, pks=pks, using=self.db)
+        return updated
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """Manager hiding soft-deleted rows."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
 
 
 class LogsMixin(models.Model):
     """Add the generic fields and relevant methods common to support mostly
     models
+
+    Related object access (e.g. ``event.property``) goes through Django's
+    base manager and still returns soft-deleted rows; check ``is_deleted``
+    where that matters. Meta.base_manager_name is left unset because save()
+    and refresh_from_db() use the base manager and must see those rows.
     """
     id = models.UUIDField(
-        db_index=True, default=uuid.uuid4, editable=False, primary_key=True
+        default=uuid7, editable=False, primary_key=True
     )
     is_deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    objects = SoftDeleteManager()
+    # Soft-deleted rows included, e.g. to restore or purge them.
+    all_objects = SoftDeleteQuerySet.as_manager()
+
     class Meta:
         """meta class for LogsMixin"""
 
@@ -22,3 +90,8 @@ class LogsMixin(models.Model):
     @classmethod
     def get_objects(cls, **kwargs):
         return cls.objects.filter(**kwargs)
+
+    def soft_delete(self):
+        """Flag the row as deleted; post_save receivers see the change."""
+        self.is_deleted = True
+        self.save(update_fields=["is_deleted", "modified_at"])
@@ -0,0 +1,31 @@
+"""``prefix``: an index-friendly ``startswith`` for case-folded columns.
+
+SQLite's LIKE is case-insensitive, so ``LIKE 'x%'`` can't use an index on a
+BINARY column and scans the table. The same prefix match written as the
+range ``x <= column < x || U+10FFFF`` is a plain index search; SQLite
+compares text by its UTF-8 bytes, which sort in code point order. Other
+databases keep the LIKE of ``startswith`` (PostgreSQL indexes it with the
+text_pattern_ops operator class).
+"""
+from django.db.models import CharField, TextField
+from django.db.models.lookups import StartsWith
+
+# The greatest code point, bounding the range of strings that start with a prefix.
+MAX_CHARACTER = "\U0010ffff"
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class Prefix(StartsWith):
+    lookup_name = "prefix"
+
+    def as_sql(self, compiler, connection):
+        # Backends only know the operators of the builtin lookup names.
+        return StartsWith(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_sqlite(self, compiler, connection):
+        if not self.rhs_is_direct_value():
+            return self.as_sql(compiler, connection)
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        params = [*lhs_params, self.rhs, *lhs_params, self.rhs + MAX_CHARACTER]
+        return f"({lhs_sql} >= %s AND {lhs_sql} < %s)", params
@@ -0,0 +1,142 @@
+"""PostgreSQL backend with connection health checks and an optional pool.
+
+Extra keys of a DATABASES entry using ENGINE "baselayer.db.postgresql":
+
+    CONN_HEALTH_CHECKS  ping a reused connection before the first query of
+                        each request and reconnect if it is dead.
+    POOL                {"min_size": .., "max_size": .., "timeout": ..} to
+                        share a process-wide pool of connections between
+                        threads. min_size connections are kept open, more
+                        are opened up to max_size and closed when handed
+                        back. Requires CONN_MAX_AGE = 0; closing a
+                        connection hands it back to the pool.
+"""
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extras as psycopg2_extras, pool as psycopg2_pool
+
+DEFAULT_POOL = {
+    "min_size": 4,
+    "max_size": 10,
+    # Seconds to wait for a free connection before giving up.
+    "timeout": 10,
+}
+
+
+class ConnectionPool:
+    """psycopg2 ThreadedConnectionPool that waits for a free connection."""
+
+    def __init__(self, conn_params, min_size, max_size, timeout):
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.pool = psycopg2_pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(f"No database connection free after {self.timeout}s")
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, connection):
+        try:
+            self.pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            self.slots.release()
+
+
+_lock = threading.Lock()
+_pools = {}
+_pid = os.getpid()
+
+
+def get_pool(alias, conn_params, options):
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Pooled sockets must not be shared with a forked worker.
+            _pools.clear()
+            _pid = os.getpid()
+        # Keyed by the parameters too, e.g. for the test database rename.
+        key = (alias, str(sorted(conn_params.items())))
+        if key not in _pools:
+            pool_options = dict(DEFAULT_POOL)
+            pool_options.update(options)
+            _pools[key] = ConnectionPool(conn_params, **pool_options)
+        return _pools[key]
+
+
+def close_pools(alias=None):
+    """Close the pooled connections of one alias, or of all of them."""
+    with _lock:
+        keys = [key for key in _pools if alias is None or key[0] == alias]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.pool.closeall()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use.
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get("CONN_HEALTH_CHECKS", False)
+        self.health_check_done = False
+        self.pool_options = self.settings_dict.get("POOL")
+        self.pool = None
+        if self.pool_options is not None and self.settings_dict["CONN_MAX_AGE"] != 0:
+            raise ImproperlyConfigured("A pooled database needs CONN_MAX_AGE = 0.")
+
+    def get_new_connection(self, conn_params):
+        if self.pool_options is None:
+            return super().get_new_connection(conn_params)
+        self.pool = get_pool(self.alias, conn_params, self.pool_options)
+        connection = self.pool.getconn()
+        # Same session setup as the parent's, on a connection it didn't open.
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get("isolation_level", connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2_extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def connect(self):
+        super().connect()
+        # A fresh connection needs no check, one from the pool might be stale.
+        self.health_check_done = self.pool_options is None
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        # Runs at the start and end of each request.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
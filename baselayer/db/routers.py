@@ -0,0 +1,121 @@
+"""Routing of read-only requests to a replica.
+
+Views with ``ReplicaReadMixin`` (baselayer/baseapiviews.py) read from
+settings.REPLICA_DATABASE, unless the user wrote something in the last
+READ_YOUR_WRITES_SECONDS: ``read_your_writes_middleware`` pins the user to the
+primary after every successful write request, so they never miss their own
+changes because of replication lag. Writes always go to the primary.
+
+The pins are kept in the default cache, which therefore has to be shared
+by the worker processes; the router refuses a process-local one.
+"""
+import asyncio
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+_read_database = contextvars.ContextVar("read_database", default=None)
+
+
+def get_pin_key(user_id):
+    return f"primary-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    cache.set(get_pin_key(user_id), True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(get_pin_key(user_id), False)
+
+
+def set_read_database(alias):
+    """Route the reads of the current context to alias.
+    :return token for reset_read_database
+    """
+    return _read_database.set(alias)
+
+
+def reset_read_database(token):
+    _read_database.reset(token)
+
+
+@contextmanager
+def read_from(alias):
+    """Route the reads inside the block to alias."""
+    token = set_read_database(alias)
+    try:
+        yield
+    finally:
+        reset_read_database(token)
+
+
+class PrimaryReplicaRouter:
+
+    def __init__(self):
+        if settings.REPLICA_DATABASE and settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+            raise ImproperlyConfigured(
+                "REPLICA_DATABASE needs a CACHE_BACKEND shared by all workers for the read-your-writes pins."
+            )
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        # Also for instances that were read from the replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, settings.REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema by replication.
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
+
+
+def is_successful_write(request, response):
+    # DRF sets the authenticated user on the Django request as well.
+    user = getattr(request, "user", None)
+    return (
+        request.method not in SAFE_METHODS
+        and response.status_code < 400
+        and user is not None
+        and user.is_authenticated
+    )
+
+
+@sync_and_async_middleware
+def read_your_writes_middleware(get_response):
+    """Pin users to the primary after their successful write requests.
+    Async capable, so ASGI requests to async views stay on the event loop.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            if is_successful_write(request, response):
+                await sync_to_async(pin_to_primary, thread_sensitive=False)(request.user.pk)
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            if is_successful_write(request, response):
+                pin_to_primary(request.user.pk)
+            return response
+    return middleware
@@ -0,0 +1,27 @@
+"""Connection tuning for the sqlite profile.
+
+The PRAGMAS of a sqlite DATABASES entry are applied to every new
+connection by ``apply_sqlite_pragmas``, a connection_created receiver
+connected in baselayer/apps.py. In WAL mode readers never wait on the
+writer; busy_timeout makes writers queue for the write lock instead of
+failing with "database is locked".
+"""
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in connection.settings_dict.get("PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def run_maintenance(using="default", checkpoint_mode="TRUNCATE"):
+    """Refresh the planner statistics and checkpoint the WAL into the database.
+    :return (busy, wal_frames, checkpointed_frames) of the checkpoint
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+        cursor.execute(f"PRAGMA wal_checkpoint({checkpoint_mode})")
+        return cursor.fetchone()
@@ -0,0 +1,113 @@
+"""Revoked token ids, checked on every authenticated request.
+
+Revocations are stored in users.RevokedToken until the token expires. Each
+process keeps a bloom filter of the unexpired ones, rebuilt from the table
+every TOKEN_REVOCATION_SYNC_SECONDS, so the common case (token not revoked)
+never touches the database. A filter hit is confirmed against the table.
+Expired rows are deleted by the purge_revoked_tokens command.
+"""
+import datetime
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class BloomFilter:
+    def __init__(self, size_bits, hash_count):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray((size_bits + 7) // 8)
+
+    def positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size_bits for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self.positions(value))
+
+
+class RevocationList:
+    def __init__(self, size_bits, hash_count, sync_seconds):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.sync_seconds = sync_seconds
+        self.lock = threading.Lock()
+        # Held by the one thread rebuilding the filter.
+        self.sync_lock = threading.Lock()
+        self.bloom = None
+        self.synced_at = 0
+        # Revoked in this process while a rebuild reads the table.
+        self.revoked_during_sync = None
+
+    def is_stale(self):
+        return self.bloom is None or time.monotonic() - self.synced_at >= self.sync_seconds
+
+    def sync(self):
+        from users.models import RevokedToken
+        with self.lock:
+            self.revoked_during_sync = []
+        bloom = BloomFilter(self.size_bits, self.hash_count)
+        for jti in RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list("jti", flat=True):
+            bloom.add(jti)
+        with self.lock:
+            for jti in self.revoked_during_sync:
+                bloom.add(jti)
+            self.revoked_during_sync = None
+            self.bloom = bloom
+            self.synced_at = time.monotonic()
+
+    def get_bloom(self):
+        if not self.is_stale():
+            return self.bloom
+        # Single flight: one thread rebuilds, the others keep the old filter
+        # and only wait when there is none yet.
+        if self.sync_lock.acquire(blocking=self.bloom is None):
+            try:
+                if self.is_stale():
+                    self.sync()
+            finally:
+                self.sync_lock.release()
+        return self.bloom
+
+    def needs_database(self, jti):
+        """False when the current filter proves the token was not revoked."""
+        bloom = self.bloom
+        if bloom is None or self.is_stale():
+            return True
+        return jti in bloom
+
+    def is_revoked(self, jti):
+        if jti not in self.get_bloom():
+            return False
+        from users.models import RevokedToken
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, payload):
+        """Revoke a decoded token until it expires."""
+        from users.models import RevokedToken
+        expires_at = datetime.datetime.fromtimestamp(payload["exp"], tz=datetime.timezone.utc)
+        RevokedToken.objects.get_or_create(jti=payload["jti"], defaults={"expires_at": expires_at})
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(payload["jti"])
+            if self.revoked_during_sync is not None:
+                self.revoked_during_sync.append(payload["jti"])
+
+    def clear(self):
+        with self.lock:
+            self.bloom = None
+
+
+revocation_list = RevocationList(
+    settings.TOKEN_REVOCATION_BLOOM_BITS,
+    settings.TOKEN_REVOCATION_BLOOM_HASHES,
+    settings.TOKEN_REVOCATION_SYNC_SECONDS,
+)
@@ -47,6 +47,7 @@ THIRD_PARTY_APPS = [
 ]
 
 PROJECT_APPS = [
+    'baselayer',
     'users',
     'user_deals'
 ]
@@ -79,6 +80,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'baselayer.db.routers.read_your_writes_middleware',
 ]
 
 ROOT_URLCONF = 'gemnineDealerBackend.urls'
@@ -105,13 +107,113 @@ WSGI_APPLICATION = 'gemnineDealerBackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_PROFILE=postgresql selects the production profile, configured by
+# the DATABASE_* variables; anything else keeps the local sqlite database.
+
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "sqlite")
+
+if DATABASE_PROFILE == "postgresql":
+    DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", 0))
+    DATABASE_STATEMENT_TIMEOUT_MS = int(os.getenv("DATABASE_STATEMENT_TIMEOUT_MS", 30000))
+    DATABASES = {
+        'default': {
+            # django.db.backends.postgresql plus health checks and pooling.
+            'ENGINE': 'baselayer.db.postgresql',
+            'NAME': os.getenv("DATABASE_NAME", "gemnine"),
+            'USER': os.getenv("DATABASE_USER", "postgres"),
+            'PASSWORD': os.getenv("DATABASE_PASSWORD", ""),
+            'HOST': os.getenv("DATABASE_HOST", "localhost"),
+            'PORT': os.getenv("DATABASE_PORT", "5432"),
+            # Persistent connections; a pool hands connections back after
+            # each request instead.
+            'CONN_MAX_AGE': 0 if DATABASE_POOL_MAX_SIZE else int(os.getenv("DATABASE_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': os.getenv("DATABASE_CONN_HEALTH_CHECKS", "true").lower() == "true",
+            'POOL': {
+                'min_size': int(os.getenv("DATABASE_POOL_MIN_SIZE", DATABASE_POOL_MAX_SIZE)),
+                'max_size': DATABASE_POOL_MAX_SIZE,
+                'timeout': float(os.getenv("DATABASE_POOL_TIMEOUT", 10)),
+            } if DATABASE_POOL_MAX_SIZE else None,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv("DATABASE_CONNECT_TIMEOUT", 5)),
+                # Milliseconds; a runaway query is cancelled instead of
+                # holding its connection and locks.
+                'options': f'-c statement_timeout={DATABASE_STATEMENT_TIMEOUT_MS}',
+            },
+        }
+    }
+    # Read replica of the primary, enabled by DATABASE_REPLICA_HOST.
+    if os.getenv("DATABASE_REPLICA_HOST"):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv("DATABASE_REPLICA_HOST"),
+            'PORT': os.getenv("DATABASE_REPLICA_PORT", DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Applied to each new connection (baselayer.db.sqlite); run the
+            # sqlite_maintenance command periodically to checkpoint the WAL.
+            'PRAGMAS': {
+                'busy_timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                # Negative sizes are KiB.
+                'cache_size': -int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024)),
+                'mmap_size': int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+            },
+        }
+    }
+
+# Safe requests to views with ReplicaReadMixin read from this alias, except
+# within READ_YOUR_WRITES_SECONDS of the user's own writes.
+REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 10))
+DATABASE_ROUTERS = ["baselayer.db.routers.PrimaryReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Local-memory by default; set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and CACHE_LOCATION to a
+# directory to share the cache between worker processes on one node.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'gemnine-dealer-backend'),
     }
 }
 
+# Public deals feed cache (user_deals.feed_cache)
+PUBLIC_DEALS_CACHE_ALIAS = 'default'
+PUBLIC_DEALS_CACHE_TIMEOUT = int(os.getenv("PUBLIC_DEALS_CACHE_TIMEOUT", 300))
+# Rows of each feed kept in the cache; deeper pages are read from the database.
+PUBLIC_DEALS_CACHE_DEPTH = int(os.getenv("PUBLIC_DEALS_CACHE_DEPTH", 50))
+
+# Per-process cache of authenticated users (baselayer.baseauthentication).
+# Saves invalidate it locally, other processes pick changes up within the TTL.
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 30))
+
+# Threads computing password hashes for logins (users.passwords)
+PASSWORD_HASHER_WORKERS = int(os.getenv("PASSWORD_HASHER_WORKERS", 4))
+
+# Threads running the ORM work of async views (baselayer.asyncviews); keep it
+# within the database connection limit, each thread holds one connection.
+ASYNC_DATABASE_WORKERS = int(os.getenv("ASYNC_DATABASE_WORKERS", 16))
+
+# JWT lifetimes (baselayer.baseauthentication)
+ACCESS_TOKEN_LIFETIME_SECONDS = int(os.getenv("ACCESS_TOKEN_LIFETIME_SECONDS", 15 * 60))
+REFRESH_TOKEN_LIFETIME_SECONDS = int(os.getenv("REFRESH_TOKEN_LIFETIME_SECONDS", 30 * 24 * 60 * 60))
+# Bloom filter of revoked token ids (baselayer.tokenrevocation), about 1%
+# false positives at 100k revocations; rebuilt from the table periodically.
+TOKEN_REVOCATION_BLOOM_BITS = 1 << 20
+TOKEN_REVOCATION_BLOOM_HASHES = 7
+TOKEN_REVOCATION_SYNC_SECONDS = int(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 30))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -185,9 +287,50 @@ logging.config.dictConfig(LOGGING)
 #THIS IS FOR CRENDENTIALS CONFIGURATION
 TWILIO_ACCOUNT_SID = ""
 TWILIO_AUTH_TOKEN = ""
+# Verify service used for all OTPs; when empty it is looked up by name (or
+# created) once per process, see utils/twilio_client.py
+TWILIO_VERIFY_SERVICE_SID = os.getenv("TWILIO_VERIFY_SERVICE_SID", "")
+# Upper bound of the twilio calls made for one request.
+TWILIO_CALL_DEADLINE_SECONDS = 8
+# Overrides the twilio API hosts, e.g. with a local fake server in tests.
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "")
+# Sender number of users.otp.TwilioSMSSender
+TWILIO_SMS_FROM = os.getenv("TWILIO_SMS_FROM", "")
+
+# OTP backends and senders, see users/otp.py
+OTP_BACKEND = os.getenv("OTP_BACKEND", "users.otp.TwilioVerifyOTPBackend")
+OTP_SENDERS = {
+    "sms": os.getenv("OTP_SMS_SENDER", "users.otp.TwilioSMSSender"),
+    "email": os.getenv("OTP_EMAIL_SENDER", "users.otp.EmailSender"),
+}
+OTP_FILE_PATH = os.getenv("OTP_FILE_PATH", BASE_DIR / "otp_codes.log")
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = 5
+OTP_SEND_LIMIT = 5
+OTP_SEND_WINDOW_SECONDS = 3600
+
+# Pooled HTTP sessions of the providers, see utils/http_transport.py
+PROVIDER_TRANSPORTS = {
+    "twilio": {"connect_timeout": 3.05, "read_timeout": 10, "pool_maxsize": 10},
+    "fcm": {"connect_timeout": 3.05, "read_timeout": 20, "pool_maxsize": 10},
+}
+# Circuit breakers of the providers, see utils/provider_guard.py
+PROVIDER_CIRCUIT_BREAKERS = {
+    "twilio": {"failure_rate": 0.5, "minimum_calls": 5, "window_seconds": 30, "open_seconds": 15},
+    "fcm": {"failure_rate": 0.5, "minimum_calls": 10, "window_seconds": 60, "open_seconds": 30},
+}
 
 #FCM CONFIGURATION
 FCM_API_KEY = ""
+# Registration ids per multicast request (FCM accepts at most 1000).
+FCM_BATCH_SIZE = 500
+
+# Deal notification outbox, see user_deals/outbox.py
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 8
+NOTIFICATION_OUTBOX_BACKOFF_SECONDS = 30
+NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS = 3600
+# A worker holding an event longer than this is assumed dead.
+NOTIFICATION_OUTBOX_LEASE_SECONDS = 600
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.0/howto/static-files/
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UserDealsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_deals'
+
+    def ready(self):
+        from user_deals import signals  # noqa: F401
+        from user_deals.search import create_search_index
+        post_migrate.connect(create_search_index, sender=self)
@@ -0,0 +1,115 @@
+"""Cache for the user independent part of the public deals feed.
+
+The first PUBLIC_DEALS_CACHE_DEPTH rows of each feed (purpose + search) are
+cached serialized, under a per-purpose generation number that is bumped on
+every Property write (see user_deals.signals). Per request only the user's
+own deals are dropped and ``is_wishlisted`` is filled in.
+
+The generations live in the database (FeedGeneration), not in the cache:
+with a process-local cache another worker would keep serving its stale
+windows until PUBLIC_DEALS_CACHE_TIMEOUT.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from baselayer.db.routers import read_from
+from user_deals.models import FeedGeneration, PropertyPurpose
+from user_deals.serializers import PropertyGenericSerializer
+from user_deals.utilies import get_property_meta, get_wishlisted_property_ids
+
+
+def get_cache():
+    return caches[settings.PUBLIC_DEALS_CACHE_ALIAS]
+
+
+def get_generation(purpose):
+    # Read from the primary: behind a lagging replica a bump would go unseen.
+    generation = (
+        FeedGeneration.objects.using(DEFAULT_DB_ALIAS)
+        .filter(purpose=purpose).values_list("generation", flat=True).first()
+    )
+    return generation or 0
+
+
+def bump_generation(*purposes):
+    """Invalidate the cached feeds of the given purposes (all when empty)."""
+    purposes = purposes or PropertyPurpose.values
+    generations = FeedGeneration.objects.filter(purpose__in=purposes)
+    if generations.update(generation=F("generation") + 1) < len(purposes):
+        # First bump of a purpose. Seeded with the current time so a
+        # generation restored with an old backup isn't reused.
+        FeedGeneration.objects.bulk_create(
+            [FeedGeneration(purpose=purpose, generation=int(time.time() * 1000)) for purpose in purposes],
+            ignore_conflicts=True,
+        )
+
+
+def feed_key(purpose, search_title):
+    search_hash = hashlib.sha1(search_title.encode()).hexdigest()
+    return f"public-deals:{purpose}:{get_generation(purpose)}:{search_hash}"
+
+
+def build_feed_window(feed, depth):
+    instances = list(feed[:depth + 1])
+    complete = len(instances) <= depth
+    instances = instances[:depth]
+    serialized_data = PropertyGenericSerializer(instances, many=True, context={
+        "property_meta": get_property_meta(instances),
+        "wishlisted_ids": set()
+    }).data
+    return {
+        "rows": [(str(instance.user_id), dict(row)) for instance, row in zip(instances, serialized_data)],
+        "count": len(instances) if complete else feed.count(),
+        "complete": complete,
+    }
+
+
+def get_cached_feed_page(feed, user, purpose, search_title, page_number, per_page=10):
+    """Serve a page of the public feed from the cache.
+    :param feed: the feed queryset before excluding the user's own deals
+    :return: (rows, pagination) shaped like custom_pagination, or None when
+        the page lies beyond the cached window
+    """
+    cache = get_cache()
+    key = feed_key(purpose, search_title)
+    window = cache.get(key)
+    if window is None:
+        # Shared by every user for the cache timeout, so never built from a
+        # lagging replica.
+        with read_from(DEFAULT_DB_ALIAS):
+            window = build_feed_window(feed, settings.PUBLIC_DEALS_CACHE_DEPTH)
+        cache.set(key, window, settings.PUBLIC_DEALS_CACHE_TIMEOUT)
+
+    user_id = str(user.id)
+    rows = [row for owner_id, row in window["rows"] if owner_id != user_id]
+    if window["complete"]:
+        count = len(rows)
+    else:
+        count = max(window["count"] - feed.filter(user=user).count(), len(rows))
+
+    num_pages = max(1, math.ceil(count / per_page))
+    number = page_number if 1 <= page_number <= num_pages else num_pages
+    bottom = (number - 1) * per_page
+    top = min(bottom + per_page, count)
+    if top > len(rows):
+        return None
+    rows = rows[bottom:top]
+
+    wishlisted_ids = {str(pk) for pk in get_wishlisted_property_ids(user, [row["id"] for row in rows])}
+    for row in rows:
+        row["is_wishlisted"] = row["id"] in wishlisted_ids
+    pagination = {
+        "total_pages": num_pages,
+        "current_page": page_number,
+        "previous_page": number - 1 if number > 1 else 0,
+        "next_page": number + 1 if number < num_pages else 0,
+        "has_next": number < num_pages,
+        "has_previous": number > 1
+    }
+    return rows, pagination
@@ -0,0 +1,267 @@
+"""Declarative filters for FilterDealsView.
+
+Each property type declares the query params it accepts; a filter set
+compiles them into a single Property query with the subtype row joined
+through ``select_related``.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from user_deals.models import Property, PropertyPurpose, PropertyType, normalize_place_name, parse_series_number
+from user_deals.serializers import (
+    FilterCommercialSerializer,
+    FilterHouseSerializer,
+    FilterPlotSerializer,
+)
+
+
+def finite_decimal(value):
+    """Decimal cast rejecting NaN and Infinity, which no price can match."""
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(f"{value} is not a finite number")
+    return number
+
+
+class DealFilter:
+    """Map one or more query params onto a Property lookup."""
+
+    def __init__(self, field, cast=str):
+        self.field = field
+        self.cast = cast
+
+    def to_value(self, raw_value):
+        try:
+            return self.cast(raw_value.strip())
+        except (ValueError, TypeError, InvalidOperation) as err:
+            raise ValueError(f"Invalid value for {self.field}: {raw_value}") from err
+
+    def get_values(self, params, param):
+        return [self.to_value(value) for value in params.getlist(param) if value.strip()]
+
+    def compile(self, params):
+        """Return a Q object for the request params, or None when not filtered."""
+        raise NotImplementedError
+
+
+class ContainsFilter(DealFilter):
+    """Case-insensitive substring match; repeated params are OR-ed."""
+
+    def __init__(self, param, field):
+        super().__init__(field)
+        self.param = param
+
+    def compile(self, params):
+        condition = None
+        for value in self.get_values(params, self.param):
+            lookup = Q(**{f"{self.field}__icontains": value})
+            condition = lookup if condition is None else condition | lookup
+        return condition
+
+
+class ExactFilter(DealFilter):
+    """Equality match; repeated params become an IN lookup."""
+
+    def __init__(self, param, field, cast=str):
+        super().__init__(field, cast)
+        self.param = param
+
+    def compile(self, params):
+        values = self.get_values(params, self.param)
+        if not values:
+            return None
+        if len(values) == 1:
+            return Q(**{self.field: values[0]})
+        return Q(**{f"{self.field}__in": values})
+
+
+class ChoiceContainsFilter(ExactFilter):
+    """Case-insensitive substring match on a choices field, compiled to an
+    indexable IN lookup of the choices that contain a value.
+    """
+
+    def __init__(self, param, field, choices):
+        super().__init__(param, field)
+        self.choices = choices
+
+    def compile(self, params):
+        values = [value.casefold() for value in self.get_values(params, self.param)]
+        if not values:
+            return None
+        choices = [choice for choice in self.choices if any(value in choice.casefold() for value in values)]
+        return Q(**{f"{self.field}__in": choices})
+
+
+class PlaceFilter(ExactFilter):
+    """Indexed equality on a normalized city/location dictionary entry."""
+
+    def __init__(self, param, field):
+        super().__init__(param, f"{field}__normalized_name", normalize_place_name)
+
+
+class RangeFilter(DealFilter):
+    """Inclusive bounds taken from a min and/or a max param."""
+
+    def __init__(self, field, min_param=None, max_param=None, cast=str):
+        super().__init__(field, cast)
+        self.min_param = min_param
+        self.max_param = max_param
+
+    def compile(self, params):
+        condition = {}
+        if self.min_param and params.get(self.min_param, "").strip():
+            condition[f"{self.field}__gte"] = self.to_value(params[self.min_param])
+        if self.max_param and params.get(self.max_param, "").strip():
+            condition[f"{self.field}__lte"] = self.to_value(params[self.max_param])
+        return Q(**condition) if condition else None
+
+
+class PriceOverlapFilter(DealFilter):
+    """Deals whose [from_price, to_price] interval overlaps [min, max].
+    Deals listed with a single total_price match when it lies in the range.
+    """
+
+    def __init__(self, min_param, max_param):
+        super().__init__("price", finite_decimal)
+        self.min_param = min_param
+        self.max_param = max_param
+
+    def compile(self, params):
+        low = params.get(self.min_param, "").strip()
+        high = params.get(self.max_param, "").strip()
+        if not low and not high:
+            return None
+        interval, total = {}, {}
+        if high:
+            interval["from_price__lte"] = total["total_price__lte"] = self.to_value(high)
+        if low:
+            interval["to_price__gte"] = total["total_price__gte"] = self.to_value(low)
+        return Q(**interval) | Q(from_price__isnull=True, to_price__isnull=True, **total)
+
+
+class PriceToleranceFilter(DealFilter):
+    """Deals whose total_price is within +/- tolerance percent of a price."""
+
+    default_tolerance = Decimal(10)
+
+    def __init__(self, param, tolerance_param):
+        super().__init__("total_price", finite_decimal)
+        self.param = param
+        self.tolerance_param = tolerance_param
+
+    def compile(self, params):
+        if not params.get(self.param, "").strip():
+            return None
+        price = self.to_value(params[self.param])
+        tolerance = self.default_tolerance
+        if params.get(self.tolerance_param, "").strip():
+            tolerance = self.to_value(params[self.tolerance_param])
+        if price < 0 or not 0 <= tolerance <= 100:
+            raise ValueError(f"Invalid price tolerance: {price} +/- {tolerance}%")
+        delta = price * tolerance / 100
+        return Q(total_price__gte=price - delta, total_price__lte=price + delta)
+
+
+class DealFilterSet:
+    """Filters, orderings and serializer for one property type."""
+
+    # ordering param value -> Property field
+    orderings = {
+        "created_at": "created_at",
+        "price": "total_price",
+        "marla": "marla",
+    }
+    default_ordering = "-created_at"
+
+    def __init__(self, property_type, related_name, serializer_class, filters):
+        self.property_type = property_type
+        self.related_name = related_name
+        self.serializer_class = serializer_class
+        self.filters = filters
+
+    def get_ordering(self, params):
+        ordering = params.get("ordering", "").strip() or self.default_ordering
+        if ordering.lstrip("-") not in self.orderings:
+            raise ValueError(f"Invalid ordering: {ordering}")
+        descending = "-" if ordering.startswith("-") else ""
+        return [f"{descending}{self.orderings[ordering.lstrip('-')]}", f"{descending}id"]
+
+    def filter(self, params):
+        """Compile request params into a Property queryset.
+        :raise ValueError: when a param value can't be parsed
+        """
+        queryset = Property.objects.filter(
+            property_type=self.property_type,
+            **{f"{self.related_name}__isnull": False},
+        ).select_related(self.related_name)
+        for deal_filter in self.filters:
+            condition = deal_filter.compile(params)
+            if condition is not None:
+                queryset = queryset.filter(condition)
+        return queryset.order_by(*self.get_ordering(params))
+
+    def get_subtypes(self, properties):
+        return [getattr(instance, self.related_name) for instance in properties]
+
+
+COMMON_FILTERS = [
+    ChoiceContainsFilter("purpose", "purpose", PropertyPurpose.values),
+    ContainsFilter("category", "category"),
+    PlaceFilter("city", "city_ref"),
+    PlaceFilter("location", "location_ref"),
+    ExactFilter("marla", "marla", int),
+    RangeFilter("marla", "marla_min", "marla_max", int),
+    RangeFilter("from_price", min_param="price_from", cast=finite_decimal),
+    RangeFilter("to_price", max_param="price_to", cast=finite_decimal),
+    PriceOverlapFilter("price_min", "price_max"),
+    PriceToleranceFilter("price", "price_tolerance"),
+]
+
+
+def room_filters(related_name):
+    return [
+        ExactFilter("bedrooms", f"{related_name}__bedrooms", int),
+        RangeFilter(f"{related_name}__bedrooms", "bedrooms_min", "bedrooms_max", int),
+        ExactFilter("bathrooms", f"{related_name}__bathrooms", int),
+        RangeFilter(f"{related_name}__bathrooms", "bathrooms_min", "bathrooms_max", int),
+    ]
+
+
+def parse_series_bound(value):
+    number = parse_series_number(value)
+    if number is None:
+        raise ValueError(f"Invalid series: {value}")
+    return number
+
+
+def series_filters(related_name):
+    return [
+        RangeFilter(f"{related_name}__series_from_number", min_param="series_from", cast=parse_series_bound),
+        RangeFilter(f"{related_name}__series_to_number", max_param="series_to", cast=parse_series_bound),
+    ]
+
+
+DEAL_FILTER_SETS = {
+    PropertyType.HOUSE: DealFilterSet(
+        PropertyType.HOUSE,
+        "propertyhouse",
+        FilterHouseSerializer,
+        COMMON_FILTERS + [
+            ContainsFilter("house", "propertyhouse__house"),
+            ContainsFilter("street", "propertyhouse__street"),
+        ] + room_filters("propertyhouse"),
+    ),
+    PropertyType.PLOT: DealFilterSet(
+        PropertyType.PLOT,
+        "propertyplot",
+        FilterPlotSerializer,
+        COMMON_FILTERS + series_filters("propertyplot"),
+    ),
+    PropertyType.COMMERCIAL: DealFilterSet(
+        PropertyType.COMMERCIAL,
+        "propertycomercial",
+        FilterCommercialSerializer,
+        COMMON_FILTERS + series_filters("propertycomercial") + room_filters("propertycomercial"),
+    ),
+}
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from user_deals.models import PropertyComercial, PropertyPlot
+
+
+class Command(BaseCommand):
+    help = "Fill series_from_number/series_to_number for plots and commercial deals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in (PropertyPlot, PropertyComercial):
+            table_name = model.__name__
+            instances = model.objects.filter(
+                Q(series_from_number__isnull=True) | Q(series_to_number__isnull=True)
+            ).only("id", "series_from", "series_to", "series_from_number", "series_to_number")
+            batch = []
+            updated = 0
+            for instance in instances.iterator(chunk_size=batch_size):
+                instance.set_series_numbers()
+                batch.append(instance)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ["series_from_number", "series_to_number"])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ["series_from_number", "series_to_number"])
+                updated += len(batch)
+            self.stdout.write(
+                self.style.SUCCESS(f"Backfilled series numbers for {updated} '{table_name}' rows.")
+            )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_deals.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = "Send the pending deal notifications from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Events processed per run.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_outbox(limit=options["limit"])
+            if processed:
+                summary = ", ".join(f"{count} {status}" for status, count in sorted(processed.items()))
+                self.stdout.write(self.style.SUCCESS(f"Processed outbox events: '{summary}'"))
+            if not options["loop"]:
+                break
+            # Drain without sleeping while there is a backlog.
+            if sum(processed.values()) < options["limit"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from baselayer.basemodels import SoftDeleteManager
+
+
+def get_soft_delete_models():
+    return [model for model in apps.get_models() if isinstance(model._default_manager, SoftDeleteManager)]
+
+
+class Command(BaseCommand):
+    help = "Hard-delete rows soft-deleted before the retention period, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=30, help="Retention of soft-deleted rows.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument("--pause", type=float, default=0.1, help="Seconds between batches.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options["older_than_days"])
+        for model in get_soft_delete_models():
+            deleted = 0
+            queryset = model.all_objects.filter(is_deleted=True, modified_at__lt=cutoff)
+            while True:
+                with transaction.atomic():
+                    ids = list(queryset.values_list("pk", flat=True)[:options["batch_size"]])
+                    if not ids:
+                        break
+                    # Cascades (e.g. a deal's subtype and wishlist rows) go in the same batch.
+                    model.all_objects.filter(pk__in=ids).delete()
+                deleted += len(ids)
+                time.sleep(options["pause"])
+            if deleted:
+                self.stdout.write(self.style.SUCCESS(f"Purged {deleted} soft-deleted rows of '{model._meta.label}'."))
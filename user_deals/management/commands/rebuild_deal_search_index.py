@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from user_deals.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the deal full-text search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        install_search_index(options["database"], rebuild=True)
+        self.stdout.write(
+            self.style.SUCCESS(f"Deal search index rebuilt on '{options['database']}'.")
+        )
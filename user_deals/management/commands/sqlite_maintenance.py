@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from baselayer.db.sqlite import run_maintenance
+
+
+class Command(BaseCommand):
+    help = "Run PRAGMA optimize and a WAL checkpoint on a SQLite database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--checkpoint", default="TRUNCATE", choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE"],
+            help="wal_checkpoint mode; PASSIVE never waits on readers or the writer.",
+        )
+        parser.add_argument("--loop", action="store_true", help="Keep running the maintenance.")
+        parser.add_argument("--interval", type=float, default=3600, help="Seconds between runs with --loop.")
+
+    def handle(self, *args, **options):
+        if connections[options["database"]].vendor != "sqlite":
+            raise CommandError(f"'{options['database']}' is not a SQLite database.")
+        while True:
+            busy, wal_frames, checkpointed_frames = run_maintenance(options["database"], options["checkpoint"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Optimized '{options['database']}', checkpointed {checkpointed_frames} of {wal_frames} "
+                f"WAL frames{' (busy)' if busy else ''}."
+            ))
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,74 @@
+"""Matching of new tickets against open counterpart tickets.
+
+Every open ticket is indexed in DealMatchKey under its property type,
+purpose, normalized city and each word of its location. A new ticket
+matches the opposite-purpose tickets in the same city whose location holds
+all of its location words.
+"""
+import re
+
+from django.db.models import Count
+
+from user_deals.models import DealMatchKey, PropertyPurpose
+from users.models import User
+
+CITY_WIDE_TOKEN = ""
+
+
+def location_tokens(location):
+    return {token[:100] for token in re.findall(r"\w+", (location or "").casefold())}
+
+
+def counterpart_purpose(purpose):
+    if purpose == PropertyPurpose.SALE:
+        return PropertyPurpose.REQUIRED
+    return PropertyPurpose.SALE
+
+
+def index_deal(instance):
+    """(Re)build the match keys of a property."""
+    DealMatchKey.objects.filter(property=instance).delete()
+    if instance.is_deleted or instance.city_ref_id is None:
+        return
+    DealMatchKey.objects.bulk_create([
+        DealMatchKey(
+            property=instance,
+            user_id=instance.user_id,
+            property_type=instance.property_type,
+            purpose=instance.purpose,
+            city_id=instance.city_ref_id,
+            token=token,
+        )
+        for token in {CITY_WIDE_TOKEN} | location_tokens(instance.location)
+    ])
+
+
+def find_counterpart_owners(ticket):
+    """Queryset of users owning open tickets that match the ticket."""
+    if ticket.city_ref_id is None:
+        return User.objects.none()
+    tokens = location_tokens(ticket.location) or {CITY_WIDE_TOKEN}
+    matching_properties = (
+        DealMatchKey.objects.filter(
+            property_type=ticket.property_type,
+            purpose=counterpart_purpose(ticket.purpose),
+            city_id=ticket.city_ref_id,
+            token__in=tokens,
+        )
+        .exclude(user_id=ticket.user_id)
+        .values("property_id")
+        .annotate(matched_tokens=Count("token", distinct=True))
+        .filter(matched_tokens=len(tokens))
+        .values("user_id")
+    )
+    return User.objects.filter(id__in=matching_properties)
+
+
+def find_counterpart_fcm_tokens(ticket):
+    return list(
+        find_counterpart_owners(ticket)
+        .exclude(fcm_token__isnull=True)
+        .exclude(fcm_token="")
+        .values_list("fcm_token", flat=True)
+        .distinct()
+    )
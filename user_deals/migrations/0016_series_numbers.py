@@ -0,0 +1,41 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0015_property_total_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertycomercial',
+            name='series_from_number',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertycomercial',
+            name='series_to_number',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyplot',
+            name='series_from_number',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyplot',
+            name='series_to_number',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='propertycomercial',
+            index=models.Index(fields=['series_from_number', 'series_to_number'], name='propertycomercial_series_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyplot',
+            index=models.Index(fields=['series_from_number', 'series_to_number'], name='propertyplot_series_idx'),
+        ),
+    ]
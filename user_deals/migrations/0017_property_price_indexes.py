@@ -0,0 +1,21 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0016_series_numbers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'purpose', 'from_price', 'to_price'], name='property_price_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'purpose', 'total_price'], name='property_total_price_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0017_property_price_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['purpose', 'created_at', 'id'], name='property_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['user', 'purpose', 'created_at', 'id'], name='property_inventory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['user', 'purpose', 'property_type', 'created_at', 'id'], name='property_inventory_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'purpose', 'created_at', 'id'], name='property_type_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whishlist',
+            index=models.Index(fields=['user', 'deals'], name='whishlist_user_deals_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def normalize_place_name(value):
+    return " ".join((value or "").split()).casefold()
+
+
+def backfill_places(apps, schema_editor):
+    Property = apps.get_model("user_deals", "Property")
+    City = apps.get_model("user_deals", "City")
+    Location = apps.get_model("user_deals", "Location")
+    cities, locations = {}, {}
+    for instance in Property.objects.only("id", "city", "location").iterator():
+        city_name = normalize_place_name(instance.city)
+        if not city_name:
+            continue
+        if city_name not in cities:
+            cities[city_name], _ = City.objects.get_or_create(
+                normalized_name=city_name, defaults={"name": " ".join(instance.city.split())}
+            )
+        city = cities[city_name]
+        location = None
+        location_name = normalize_place_name(instance.location)
+        if location_name:
+            if (city_name, location_name) not in locations:
+                locations[(city_name, location_name)], _ = Location.objects.get_or_create(
+                    city=city, normalized_name=location_name, defaults={"name": " ".join(instance.location.split())}
+                )
+            location = locations[(city_name, location_name)]
+        Property.objects.filter(id=instance.id).update(city_ref=city, location_ref=location)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0018_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=50)),
+                ('normalized_name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('name', models.TextField()),
+                ('normalized_name', models.TextField()),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='user_deals.city')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='city_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='properties', to='user_deals.city'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='location_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='properties', to='user_deals.location'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('city', 'normalized_name'), name='unique_city_location'),
+        ),
+        migrations.RunPython(backfill_places, migrations.RunPython.noop),
+    ]
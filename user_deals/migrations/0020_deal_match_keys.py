@@ -0,0 +1,59 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+import uuid
+
+
+def backfill_match_keys(apps, schema_editor):
+    Property = apps.get_model("user_deals", "Property")
+    DealMatchKey = apps.get_model("user_deals", "DealMatchKey")
+    keys = []
+    for instance in Property.objects.filter(is_deleted=False, city_ref__isnull=False).iterator():
+        tokens = {token[:100] for token in re.findall(r"\w+", (instance.location or "").casefold())}
+        for token in {""} | tokens:
+            keys.append(DealMatchKey(
+                property_id=instance.id,
+                user_id=instance.user_id,
+                property_type=instance.property_type,
+                purpose=instance.purpose,
+                city_id=instance.city_ref_id,
+                token=token,
+            ))
+        if len(keys) >= 500:
+            DealMatchKey.objects.bulk_create(keys)
+            keys = []
+    DealMatchKey.objects.bulk_create(keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('user_deals', '0019_place_dictionary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealMatchKey',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('property_type', models.CharField(choices=[('house', 'House'), ('plot', 'Plot'), ('commercial', 'Commercial')], max_length=50)),
+                ('purpose', models.CharField(choices=[('sale', 'Sale'), ('required', 'Required'), ('rent', 'Rent')], max_length=50)),
+                ('token', models.CharField(blank=True, max_length=100)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user_deals.city')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_keys', to='user_deals.property')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dealmatchkey',
+            index=models.Index(fields=['property_type', 'purpose', 'city', 'token'], name='deal_match_key_idx'),
+        ),
+        migrations.RunPython(backfill_match_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:40
+
+import baselayer.basemodels
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0021_notification_outbox'),
+    ]
+
+    # Ids are generated in Python and the primary key index is unchanged
+    # (db_index was redundant on it), so existing rows keep their ids and no
+    # table is rebuilt.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='city',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='dealeventoutbox',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='dealmatchkey',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='location',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='notificationdelivery',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='property',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='propertycomercial',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='propertyhouse',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='propertyplot',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='whishlist',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
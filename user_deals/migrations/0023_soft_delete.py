@@ -0,0 +1,69 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0022_uuid7_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_price_range_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_total_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_inventory_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_inventory_type_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_type_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='whishlist',
+            name='whishlist_user_deals_idx',
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['purpose', 'created_at', 'id'], name='property_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'purpose', 'created_at', 'id'], name='property_inventory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'purpose', 'property_type', 'created_at', 'id'], name='property_inventory_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['property_type', 'purpose', 'created_at', 'id'], name='property_type_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['property_type', 'purpose', 'from_price', 'to_price'], name='property_price_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['property_type', 'purpose', 'total_price'], name='property_total_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whishlist',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'deals'], name='whishlist_user_deals_idx'),
+        ),
+    ]
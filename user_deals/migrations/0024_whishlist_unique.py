@@ -0,0 +1,38 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_whishlist(apps, schema_editor):
+    """Keep one row per (user, deals): a live one if any, else the latest."""
+    Whishlist = apps.get_model("user_deals", "Whishlist")
+    duplicates = (
+        Whishlist.objects.values("user", "deals").annotate(rows=Count("id")).filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        ids = list(
+            Whishlist.objects.filter(user=duplicate["user"], deals=duplicate["deals"])
+            .order_by("is_deleted", "-modified_at")
+            .values_list("id", flat=True)
+        )
+        Whishlist.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0023_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_whishlist, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='whishlist',
+            name='whishlist_user_deals_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='whishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'deals'), name='whishlist_user_deals_uniq'),
+        ),
+    ]
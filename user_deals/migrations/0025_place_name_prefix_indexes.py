@@ -0,0 +1,26 @@
+# Generated by Django 3.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0024_whishlist_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='city',
+            name='normalized_name',
+            field=models.TextField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['normalized_name'], name='city_name_prefix_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['city', 'normalized_name'], name='location_name_prefix_idx', opclasses=['uuid_ops', 'text_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.7 on 2026-10-18 14:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0025_place_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='whishlist',
+            name='deals',
+            field=models.ForeignKey(limit_choices_to=models.Q(('is_deleted', False)), on_delete=django.db.models.deletion.CASCADE, to='user_deals.property'),
+        ),
+    ]
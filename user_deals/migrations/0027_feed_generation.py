@@ -0,0 +1,20 @@
+# Generated by Django 3.2.7 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_deals', '0026_whishlist_live_deals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedGeneration',
+            fields=[
+                ('purpose', models.CharField(choices=[('sale', 'Sale'), ('required', 'Required'), ('rent', 'Rent')], max_length=50, primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -1,5 +1,8 @@
+import re
+
 from django.db import models
-from baselayer.basemodels import LogsMixin
+from django.utils import timezone
+from baselayer.basemodels import LogsMixin, SoftDeleteManager
 from users.models import User
 
 
@@ -16,6 +19,101 @@ class PropertyType(models.TextChoices):
     COMMERCIAL = "commercial", "Commercial"
 
 
+def parse_series_number(value):
+    """Numeric part of a series label, e.g. "1005" -> 1005 and "r12" -> 12."""
+    match = re.search(r"\d+", value or "")
+    return int(match.group()) if match else None
+
+
+class SeriesNumbersMixin(models.Model):
+    """Numeric copies of series_from/series_to so ranges compare as numbers."""
+    series_from_number = models.BigIntegerField(null=True, blank=True)
+    series_to_number = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(
+                fields=["series_from_number", "series_to_number"],
+                name="%(class)s_series_idx",
+            ),
+        ]
+
+    def set_series_numbers(self):
+        self.series_from_number = parse_series_number(self.series_from)
+        self.series_to_number = parse_series_number(self.series_to)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.set_series_numbers()
+        elif {"series_from", "series_to"} & set(update_fields):
+            self.set_series_numbers()
+            kwargs["update_fields"] = {*update_fields, "series_from_number", "series_to_number"}
+        super().save(*args, **kwargs)
+
+
+# Condition of the partial indexes on soft-deletable listing tables.
+LIVE_ROWS = models.Q(is_deleted=False)
+
+
+def normalize_place_name(value):
+    """Case-fold and collapse whitespace so spelling variants share one entry."""
+    return " ".join((value or "").split()).casefold()
+
+
+class City(LogsMixin):
+    """Dictionary of cities referenced by Property.city_ref."""
+    name = models.CharField(max_length=50)
+    # Case folding can make a name longer, e.g. "ß" becomes "ss".
+    normalized_name = models.TextField(unique=True)
+
+    class Meta:
+        indexes = [
+            # Prefix (LIKE 'x%') searches on PostgreSQL, whatever the collation.
+            models.Index(fields=["normalized_name"], name="city_name_prefix_idx", opclasses=["text_pattern_ops"]),
+        ]
+
+    @classmethod
+    def resolve(cls, name):
+        normalized_name = normalize_place_name(name)
+        if not normalized_name:
+            return None
+        city, _ = cls.objects.get_or_create(
+            normalized_name=normalized_name, defaults={"name": " ".join(name.split())}
+        )
+        return city
+
+
+class Location(LogsMixin):
+    """Dictionary of locations (areas) within a city."""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name="locations")
+    name = models.TextField()
+    normalized_name = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["city", "normalized_name"], name="unique_city_location"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["city", "normalized_name"],
+                name="location_name_prefix_idx",
+                opclasses=["uuid_ops", "text_pattern_ops"],
+            ),
+        ]
+
+    @classmethod
+    def resolve(cls, city, name):
+        normalized_name = normalize_place_name(name)
+        if city is None or not normalized_name:
+            return None
+        location, _ = cls.objects.get_or_create(
+            city=city, normalized_name=normalized_name, defaults={"name": " ".join(name.split())}
+        )
+        return location
+
+
 class Property(LogsMixin):
     user = models.ForeignKey(User, on_delete = models.CASCADE, related_name='properties')
     title = models.CharField(max_length = 100)
@@ -25,6 +123,10 @@ class Property(LogsMixin):
     category = models.CharField(max_length=50)
     city = models.CharField(max_length= 50)
     location = models.TextField()
+    city_ref = models.ForeignKey(City, on_delete=models.SET_NULL, null=True, blank=True, related_name="properties")
+    location_ref = models.ForeignKey(
+        Location, on_delete=models.SET_NULL, null=True, blank=True, related_name="properties"
+    )
     #unit = models.FloatField(max_length=50)
     marla = models.IntegerField()
     total_price = models.DecimalField(max_digits=15, decimal_places=2, default=None, null=True, blank=True)
@@ -34,6 +136,51 @@ class Property(LogsMixin):
     contact_number = models.CharField(max_length=50)
     is_notified = models.BooleanField(default=True)
 
+    class Meta:
+        # Matched to the listing queries in user_deals/views.py; the plans are
+        # checked in user_deals/tests.py. Only live rows are indexed, the
+        # default manager filters out soft-deleted ones.
+        indexes = [
+            models.Index(fields=["purpose", "created_at", "id"], name="property_feed_idx", condition=LIVE_ROWS),
+            models.Index(
+                fields=["user", "purpose", "created_at", "id"], name="property_inventory_idx", condition=LIVE_ROWS
+            ),
+            models.Index(
+                fields=["user", "purpose", "property_type", "created_at", "id"],
+                name="property_inventory_type_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["property_type", "purpose", "created_at", "id"],
+                name="property_type_feed_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["property_type", "purpose", "from_price", "to_price"],
+                name="property_price_range_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["property_type", "purpose", "total_price"],
+                name="property_total_price_idx",
+                condition=LIVE_ROWS,
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.resolve_places()
+        elif {"city", "location"} & set(update_fields):
+            self.resolve_places()
+            kwargs["update_fields"] = {*update_fields, "city_ref", "location_ref"}
+        super().save(*args, **kwargs)
+
+    def resolve_places(self):
+        """Point city_ref/location_ref at the dictionary entries for city/location."""
+        self.city_ref = City.resolve(self.city)
+        self.location_ref = Location.resolve(self.city_ref, self.location)
+
 
 # Property Houses class (More attributes can be added later)
 class PropertyHouse(LogsMixin):
@@ -45,12 +192,12 @@ class PropertyHouse(LogsMixin):
 
 
 # Property Plot class (More attributes can be added later)
-class PropertyPlot(LogsMixin):
+class PropertyPlot(SeriesNumbersMixin, LogsMixin):
     series_from = models.CharField(max_length=150)
     series_to = models.CharField(max_length=150)
     property = models.OneToOneField(Property, on_delete = models.CASCADE)
 
-class PropertyComercial(LogsMixin):
+class PropertyComercial(SeriesNumbersMixin, LogsMixin):
     bedrooms = models.IntegerField(null=True, blank=True)
     bathrooms = models.IntegerField(null=True, blank=True)
     series_from = models.CharField(max_length=150)
@@ -58,6 +205,88 @@ class PropertyComercial(LogsMixin):
     property = models.OneToOneField(Property, on_delete = models.CASCADE)
     
 
+class WhishlistManager(SoftDeleteManager):
+    """Live wishlist rows of live deals."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deals__is_deleted=False)
+
+
 class Whishlist(LogsMixin):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='whishlists')
-    deals = models.ForeignKey(Property, on_delete=models.CASCADE)
+    deals = models.ForeignKey(Property, on_delete=models.CASCADE, limit_choices_to=LIVE_ROWS)
+
+    objects = WhishlistManager()
+
+    class Meta:
+        # Over soft-deleted rows too: adding a deal again revives its row.
+        constraints = [
+            models.UniqueConstraint(fields=["user", "deals"], name="whishlist_user_deals_uniq"),
+        ]
+
+
+class DealMatchKey(LogsMixin):
+    """Index of open tickets by (type, purpose, city, location token) used to
+    find counterpart deals; maintained by user_deals.matching.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="match_keys")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    property_type = models.CharField(max_length=50, choices=PropertyType.choices)
+    purpose = models.CharField(max_length=50, choices=PropertyPurpose.choices)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name="+")
+    # "" marks the city-wide key every ticket gets.
+    token = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["property_type", "purpose", "city", "token"], name="deal_match_key_idx"),
+        ]
+
+
+class FeedGeneration(models.Model):
+    """Generation of the cached public feed of a purpose (user_deals.feed_cache).
+    Kept in the database so a bump is seen by every process at once.
+    """
+    purpose = models.CharField(max_length=50, choices=PropertyPurpose.choices, primary_key=True)
+    generation = models.BigIntegerField()
+
+
+class DealEventType(models.TextChoices):
+    DEAL_CREATED = "deal_created", "Deal created"
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    PROCESSING = "processing", "Processing"
+    SENT = "sent", "Sent"
+    FAILED = "failed", "Failed"
+
+
+class DealEventOutbox(LogsMixin):
+    """Deal events written in the same transaction as the deal and drained by
+    the process_notification_outbox command.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="outbox_events")
+    event_type = models.CharField(max_length=50, choices=DealEventType.choices)
+    status = models.CharField(max_length=20, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="deal_outbox_due_idx"),
+        ]
+
+
+class NotificationDelivery(LogsMixin):
+    """One FCM multicast batch of an outbox event and its result."""
+    event = models.ForeignKey(DealEventOutbox, on_delete=models.CASCADE, related_name="deliveries")
+    registration_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    response = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
@@ -0,0 +1,164 @@
+"""Transactional outbox for deal notifications.
+
+Views call ``enqueue_deal_created`` inside the transaction that creates the
+deal; ``process_notification_outbox`` claims due events, resolves the
+recipients once into FCM multicast batches (NotificationDelivery rows) and
+sends them, retrying failed batches with exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from user_deals.matching import find_counterpart_fcm_tokens
+from user_deals.models import DealEventOutbox, DealEventType, NotificationDelivery, OutboxStatus
+from utils.reuseable import get_deal_notification, send_firebase_multicast
+
+logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
+
+
+class LeaseLost(Exception):
+    """The lease on an event expired and another worker claimed it."""
+
+
+def enqueue_deal_created(ticket):
+    """Record a deal-created event; call inside the transaction saving the ticket."""
+    return DealEventOutbox.objects.create(property=ticket, event_type=DealEventType.DEAL_CREATED)
+
+
+def get_retry_delay(attempts):
+    delay = settings.NOTIFICATION_OUTBOX_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+def get_due_events(now=None):
+    """Events ready to be processed, including ones whose worker died mid-run."""
+    now = now or timezone.now()
+    stale_before = now - timedelta(seconds=settings.NOTIFICATION_OUTBOX_LEASE_SECONDS)
+    return DealEventOutbox.objects.filter(
+        Q(status=OutboxStatus.PENDING, next_attempt_at__lte=now)
+        | Q(status=OutboxStatus.PROCESSING, modified_at__lt=stale_before)
+    ).order_by("next_attempt_at")
+
+
+def claim_event(event_id, now=None):
+    """Atomically move a due event to PROCESSING; False when another worker won."""
+    now = now or timezone.now()
+    return bool(
+        get_due_events(now).filter(id=event_id).update(
+            status=OutboxStatus.PROCESSING, attempts=F("attempts") + 1, modified_at=now
+        )
+    )
+
+
+def renew_lease(event, now=None):
+    """Extend the lease on a claimed event; False when another worker has
+    claimed it since, which bumped its attempts.
+    """
+    now = now or timezone.now()
+    return bool(
+        DealEventOutbox.objects.filter(
+            id=event.id, status=OutboxStatus.PROCESSING, attempts=event.attempts
+        ).update(modified_at=now)
+    )
+
+
+def create_deliveries(event):
+    tokens = find_counterpart_fcm_tokens(event.property)
+    batch_size = settings.FCM_BATCH_SIZE
+    return NotificationDelivery.objects.bulk_create([
+        NotificationDelivery(event=event, registration_ids=tokens[start:start + batch_size])
+        for start in range(0, len(tokens), batch_size)
+    ])
+
+
+def send_delivery(delivery, notification):
+    delivery.attempts += 1
+    try:
+        response = send_firebase_multicast(registration_ids=delivery.registration_ids, **notification)
+    except Exception as err:
+        delivery.last_error = f"{type(err).__name__}: {err}"
+        delivery.status = OutboxStatus.FAILED
+    else:
+        delivery.status = OutboxStatus.SENT
+        delivery.success_count = response["success"]
+        delivery.failure_count = response["failure"]
+        delivery.response = {"multicast_ids": response["multicast_ids"], "results": response["results"]}
+        delivery.last_error = ""
+    delivery.save()
+    return delivery.status == OutboxStatus.SENT
+
+
+def process_event(event):
+    """Send the unsent batches of a claimed event and schedule a retry if needed.
+    :return: the event status after processing
+    :raise LeaseLost
+    """
+    now = timezone.now()
+    if event.property.is_deleted:
+        event.status = OutboxStatus.SENT
+        event.processed_at = now
+        event.save()
+        return event.status
+
+    deliveries = list(event.deliveries.exclude(status=OutboxStatus.SENT))
+    if not deliveries and not event.deliveries.exists():
+        deliveries = create_deliveries(event)
+
+    notification = get_deal_notification(event.property)
+    errors = []
+    for delivery in deliveries:
+        # A batch is only sent while the lease is ours, so a slow run can't
+        # send the same batches as the worker that took over its event.
+        if not renew_lease(event):
+            raise LeaseLost(f"Lease on outbox event {event.id} lost, left to the worker that claimed it")
+        if not send_delivery(delivery, notification):
+            errors.append(delivery.last_error)
+    if not errors:
+        event.status = OutboxStatus.SENT
+        event.processed_at = now
+        event.last_error = ""
+    elif event.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+        event.status = OutboxStatus.FAILED
+        event.processed_at = now
+        event.last_error = errors[0]
+        logger.error(f"Giving up on outbox event {event.id} after {event.attempts} attempts: {errors[0]}")
+    else:
+        event.status = OutboxStatus.PENDING
+        event.next_attempt_at = now + get_retry_delay(event.attempts)
+        event.last_error = errors[0]
+        logger.warning(f"Outbox event {event.id} failed, retrying at {event.next_attempt_at}: {errors[0]}")
+    event.save()
+    return event.status
+
+
+def process_outbox(limit=100):
+    """Process up to ``limit`` due events.
+    :return: {status: number of events}
+    """
+    processed = {}
+    for event_id in list(get_due_events().values_list("id", flat=True)[:limit]):
+        if not claim_event(event_id):
+            continue
+        event = DealEventOutbox.objects.select_related("property").get(id=event_id)
+        try:
+            status = process_event(event)
+        except LeaseLost as err:
+            logger.warning(err)
+            continue
+        except Exception as err:
+            logger.exception(f"Error processing outbox event {event_id}")
+            if event.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+                status = OutboxStatus.FAILED
+            else:
+                status = OutboxStatus.PENDING
+            DealEventOutbox.objects.filter(id=event_id).update(
+                status=status,
+                next_attempt_at=timezone.now() + get_retry_delay(event.attempts),
+                last_error=f"{type(err).__name__}: {err}",
+                modified_at=timezone.now(),
+            )
+        processed[status] = processed.get(status, 0) + 1
+    return processed
@@ -0,0 +1,172 @@
+"""Full-text search over deal titles, descriptions, cities and locations.
+
+SQLite keeps an FTS5 table in sync with ``user_deals_property`` through
+triggers, its rows carry the property id (the implicit rowid of the
+property table is not stable across VACUUM). PostgreSQL matches against a
+GIN expression index. Both are
+(re)installed after every ``migrate``; other backends fall back to
+``title__icontains``.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models.expressions import RawSQL
+
+from user_deals.models import Property
+
+logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
+
+PROPERTY_TABLE = Property._meta.db_table
+SEARCH_TABLE = "user_deals_property_fts"
+SEARCH_COLUMNS = ("title", "description", "city", "location")
+# bm25 column weights, in SEARCH_COLUMNS order.
+SEARCH_WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+SQLITE_TRIGGERS = {
+    f"{SEARCH_TABLE}_insert": f"""
+        CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON {PROPERTY_TABLE} BEGIN
+            INSERT INTO {SEARCH_TABLE}(property_id, title, description, city, location)
+            VALUES (new.id, new.title, new.description, new.city, new.location);
+        END
+    """,
+    f"{SEARCH_TABLE}_update": f"""
+        CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE OF id, title, description, city, location
+        ON {PROPERTY_TABLE} BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE property_id = old.id;
+            INSERT INTO {SEARCH_TABLE}(property_id, title, description, city, location)
+            VALUES (new.id, new.title, new.description, new.city, new.location);
+        END
+    """,
+    f"{SEARCH_TABLE}_delete": f"""
+        CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON {PROPERTY_TABLE} BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE property_id = old.id;
+        END
+    """,
+}
+
+POSTGRES_INDEX = "user_deals_property_search_idx"
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '') || ' ' || "
+    "coalesce(city, '') || ' ' || coalesce(location, ''))"
+)
+POSTGRES_RANK = (
+    "ts_rank("
+    f"setweight(to_tsvector('simple', coalesce({PROPERTY_TABLE}.title, '')), 'A') || "
+    f"setweight(to_tsvector('simple', coalesce({PROPERTY_TABLE}.city, '') || ' ' || "
+    f"coalesce({PROPERTY_TABLE}.location, '')), 'B') || "
+    f"setweight(to_tsvector('simple', coalesce({PROPERTY_TABLE}.description, '')), 'D'), "
+    "to_tsquery('simple', %s))"
+)
+
+# database alias -> whether the search index is usable on it
+_search_enabled = {}
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def install_search_index(using="default", rebuild=False):
+    """Create the search index for the database if it is missing.
+    SQLite rebuilds the index content whenever a trigger had to be
+    (re)created, e.g. after a migration remade the property table.
+    """
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [PROPERTY_TABLE]
+            )
+            existing_triggers = {row[0] for row in cursor.fetchall()}
+            missing_triggers = [name for name in SQLITE_TRIGGERS if name not in existing_triggers]
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+            search_table = cursor.fetchone()
+            if search_table and "property_id" not in search_table[0]:
+                # Index keyed on the property rowid, from before property_id.
+                for name in SQLITE_TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE {SEARCH_TABLE}")
+                missing_triggers = list(SQLITE_TRIGGERS)
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    f"property_id UNINDEXED, {', '.join(SEARCH_COLUMNS)}, "
+                    "tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            except DatabaseError as err:
+                logger.warning(f"FTS5 is not available, deal search falls back to LIKE: {err}")
+                _search_enabled[using] = False
+                return
+            for name in missing_triggers:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing_triggers or rebuild:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE}(property_id, {', '.join(SEARCH_COLUMNS)}) "
+                    f"SELECT id, {', '.join(SEARCH_COLUMNS)} FROM {PROPERTY_TABLE}"
+                )
+        _search_enabled[using] = True
+    elif connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            if rebuild:
+                cursor.execute(f"DROP INDEX IF EXISTS {POSTGRES_INDEX}")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON {PROPERTY_TABLE} USING GIN (({POSTGRES_DOCUMENT}))"
+            )
+        _search_enabled[using] = True
+
+
+def create_search_index(sender, using="default", **kwargs):
+    """post_migrate receiver keeping the search index installed."""
+    install_search_index(using)
+
+
+def is_search_enabled(using):
+    if using not in _search_enabled:
+        connection = connections[using]
+        if connection.vendor == "sqlite":
+            _search_enabled[using] = SEARCH_TABLE in connection.introspection.table_names()
+        else:
+            _search_enabled[using] = connection.vendor == "postgresql"
+    return _search_enabled[using]
+
+
+def is_search_result(queryset):
+    """True for querysets returned by search_properties, ordered by rank."""
+    return "search_rank" in queryset.query.annotations or "search_rank" in queryset.query.extra
+
+
+def search_properties(queryset, search_text):
+    """Filter a Property queryset to deals matching search_text, best match first.
+    Every word is matched as a prefix over title, description, city and
+    location; the result is annotated with ``search_rank``.
+    """
+    tokens = tokenize(search_text)
+    if not tokens:
+        # Nothing to search for, e.g. only punctuation.
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if not is_search_enabled(queryset.db):
+        return queryset.filter(title__icontains=search_text)
+
+    if vendor == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        # Joined on the property id, so bm25() runs once per match instead of
+        # a MATCH per row in a correlated subquery.
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        return queryset.extra(
+            select={"search_rank": f"-bm25({SEARCH_TABLE}, 0, {weights})"},
+            tables=[SEARCH_TABLE],
+            where=[f"{SEARCH_TABLE} MATCH %s", f"{SEARCH_TABLE}.property_id = {PROPERTY_TABLE}.id"],
+            params=[match],
+        ).order_by("-search_rank", "-created_at")
+
+    match = " & ".join(f"{token}:*" for token in tokens)
+    matches = RawSQL(
+        f"SELECT id FROM {PROPERTY_TABLE} WHERE {POSTGRES_DOCUMENT} @@ to_tsquery('simple', %s)",
+        [match],
+    )
+    rank = RawSQL(POSTGRES_RANK, [match])
+    return queryset.filter(id__in=matches).annotate(search_rank=rank).order_by("-search_rank", "-created_at")
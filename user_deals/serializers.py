@@ -3,11 +3,22 @@ from user_deals.models import (
     Property,
     PropertyHouse,
     PropertyPlot,
-    Whishlist,
     PropertyComercial
     )
+from user_deals.utilies import get_property_meta, get_wishlisted_property_ids
 
-class PropertyGenericSerializer(serializers.ModelSerializer):
+
+class WishlistedMixin:
+    """Resolve is_wishlisted from the page-level set in the serializer context."""
+
+    def is_wishlisted(self, property_id):
+        wishlisted_ids = self.context.get("wishlisted_ids")
+        if wishlisted_ids is None:
+            wishlisted_ids = get_wishlisted_property_ids(self.context.get("user"), [property_id])
+        return property_id in wishlisted_ids
+
+
+class PropertyGenericSerializer(WishlistedMixin, serializers.ModelSerializer):
     meta = serializers.SerializerMethodField()
     is_wishlisted = serializers.SerializerMethodField()
 
@@ -34,39 +45,13 @@ class PropertyGenericSerializer(serializers.ModelSerializer):
         model = Property
     
     def get_meta(self, obj):
-        try:
-            instance = PropertyHouse.objects.get(property=obj)
-            return {
-                "house": instance.house,
-                "street": instance.street,
-                "bedrooms": instance.bedrooms,
-                "bathrooms": instance.bathrooms
-            }
-        except:
-            try:
-                instance = PropertyPlot.objects.get(property=obj)
-                return {
-                    "series_from": instance.series_from,
-                    "series_to": instance.series_to
-                }
-            except:
-                try:
-                    instance = PropertyComercial.objects.get(property=obj)
-                    return {
-                        "series_from": instance.series_from,
-                        "series_to": instance.series_to,
-                        "bedrooms": instance.bedrooms,
-                        "bathrooms": instance.bathrooms
-                    }
-                except:
-                    return None
+        property_meta = self.context.get("property_meta")
+        if property_meta is None:
+            property_meta = get_property_meta([obj])
+        return property_meta.get(obj.id)
 
     def get_is_wishlisted(self, obj):
-        user = self.context.get("user")
-        if Whishlist.objects.filter(user=user, deals=obj).exists():
-            return True
-        else:
-            return False
+        return self.is_wishlisted(obj.id)
 
 
 class PropertyHouseSerializer(serializers.ModelSerializer):
@@ -223,15 +208,11 @@ class FilterPropertySerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class FilterHouseSerializer(serializers.ModelSerializer):
+class FilterHouseSerializer(WishlistedMixin, serializers.ModelSerializer):
     is_wishlisted = serializers.SerializerMethodField()
     
     def get_is_wishlisted(self, obj):
-        user = self.context.get("user")
-        if Whishlist.objects.filter(user=user, deals=obj.property).exists():
-            return True
-        else:
-            return False
+        return self.is_wishlisted(obj.property_id)
         
 
     class Meta:
@@ -253,23 +234,18 @@ class FilterHouseSerializer(serializers.ModelSerializer):
         data["total_price"] = instance.property.total_price
         data["contact_name"] = instance.property.contact_name
         data["contact_number"] = instance.property.contact_number
-        data["is_wishlisted"] = self.get_is_wishlisted(instance)
         return data
 
 
-class FilterPlotSerializer(serializers.ModelSerializer):
+class FilterPlotSerializer(WishlistedMixin, serializers.ModelSerializer):
     is_wishlisted = serializers.SerializerMethodField()
     
     def get_is_wishlisted(self, obj):
-        user = self.context.get("user")
-        if Whishlist.objects.filter(user=user, deals=obj.property).exists():
-            return True
-        else:
-            return False
+        return self.is_wishlisted(obj.property_id)
     
     class Meta:
         model = PropertyPlot
-        fields = "__all__"
+        exclude = ["series_from_number", "series_to_number"]
         
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -286,23 +262,18 @@ class FilterPlotSerializer(serializers.ModelSerializer):
         data["total_price"] = instance.property.total_price
         data["contact_name"] = instance.property.contact_name
         data["contact_number"] = instance.property.contact_number
-        data["is_wishlisted"] = self.get_is_wishlisted(instance)
         return data
 
 
-class FilterCommercialSerializer(serializers.ModelSerializer):
+class FilterCommercialSerializer(WishlistedMixin, serializers.ModelSerializer):
     is_wishlisted = serializers.SerializerMethodField()
 
     def get_is_wishlisted(self, obj):
-        user = self.context.get("user")
-        if Whishlist.objects.filter(user=user, deals=obj.property).exists():
-            return True
-        else:
-            return False
+        return self.is_wishlisted(obj.property_id)
 
     class Meta:
-        model = PropertyPlot
-        fields = "__all__"
+        model = PropertyComercial
+        exclude = ["series_from_number", "series_to_number"]
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -319,5 +290,4 @@ class FilterCommercialSerializer(serializers.ModelSerializer):
         data["total_price"] = instance.property.total_price
         data["contact_name"] = instance.property.contact_name
         data["contact_number"] = instance.property.contact_number
-        data["is_wishlisted"] = self.get_is_wishlisted(instance)
         return data
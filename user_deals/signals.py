@@ -0,0 +1,52 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from baselayer.basemodels import post_soft_delete
+from user_deals.feed_cache import bump_generation
+from user_deals.matching import index_deal
+from user_deals.models import DealMatchKey, Property, PropertyComercial, PropertyHouse, PropertyPlot
+
+
+def bump_generation_on_commit(using, *purposes):
+    # Bumped before the commit, a concurrent feed request could cache the
+    # old rows under the new generation.
+    transaction.on_commit(partial(bump_generation, *purposes), using=using)
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created, using, **kwargs):
+    # An update may have changed the purpose, so every feed is invalidated.
+    if created:
+        bump_generation_on_commit(using, instance.purpose)
+    else:
+        bump_generation_on_commit(using)
+
+
+@receiver(post_save, sender=Property)
+def property_match_keys(sender, instance, **kwargs):
+    index_deal(instance)
+
+
+@receiver(post_soft_delete, sender=Property)
+def properties_soft_deleted(sender, pks, using, **kwargs):
+    # Same as a save of each deal: out of the feeds and of matching.
+    DealMatchKey.objects.using(using).filter(property_id__in=pks).delete()
+    bump_generation_on_commit(using)
+
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, using, **kwargs):
+    bump_generation_on_commit(using, instance.purpose)
+
+
+@receiver(post_save, sender=PropertyHouse)
+@receiver(post_save, sender=PropertyPlot)
+@receiver(post_save, sender=PropertyComercial)
+@receiver(post_delete, sender=PropertyHouse)
+@receiver(post_delete, sender=PropertyPlot)
+@receiver(post_delete, sender=PropertyComercial)
+def property_meta_changed(sender, instance, using, **kwargs):
+    bump_generation_on_commit(using)
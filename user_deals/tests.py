@@ -1,3 +1,966 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, Q
+from django.http import QueryDict
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from baselayer import basemodels
+from baselayer.baseauthentication import user_cache
+from baselayer.db import routers
+from user_deals import feed_cache, outbox, views
+from user_deals.filters import DEAL_FILTER_SETS
+from user_deals.matching import find_counterpart_fcm_tokens, find_counterpart_owners
+from user_deals.models import (
+    City, DealEventOutbox, FeedGeneration, Location, OutboxStatus, Property, PropertyComercial, PropertyHouse,
+    PropertyPlot, PropertyPurpose, PropertyType, Whishlist,
+)
+from user_deals.search import search_properties
+from user_deals.serializers import PropertyGenericSerializer
+from user_deals.utilies import get_property_meta, get_wishlisted_property_ids, prefix_lookup
+from users.models import User, UserProfile
+from utils.mock_responses import ResponseMessages
+
+
+class HotQueryPlanTests(TestCase):
+    """EXPLAIN the deal listing queries and fail on full scans or sorts.
+
+    The querysets mirror the ones built in user_deals/views.py. On
+    PostgreSQL sequential scans and sorts are disabled for the session, so
+    a Seq Scan or Sort node in the plan means no index can serve the query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+                cursor.execute("SET enable_sort = off")
+
+    def tearDown(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+                cursor.execute("RESET enable_sort")
+
+    def get_plan_problems(self, queryset):
+        if connection.vendor == "sqlite":
+            plan = queryset.explain()
+            problems = []
+            for line in plan.splitlines():
+                detail = line.split(" ", 3)[-1]
+                if detail.startswith("SCAN ") or "TEMP B-TREE" in detail:
+                    problems.append(detail)
+            return plan, problems
+        if connection.vendor == "postgresql":
+            # Django 3.2's explain() returns the repr of the decoded JSON.
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            problems = []
+            nodes = [plan[0]["Plan"]]
+            while nodes:
+                node = nodes.pop()
+                if node["Node Type"] in ("Seq Scan", "Sort", "Incremental Sort"):
+                    problems.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+                nodes.extend(node.get("Plans", []))
+            return json.dumps(plan, indent=2), problems
+        self.skipTest(f"No plan checks for {connection.vendor}")
+
+    def assertIndexed(self, queryset):
+        plan, problems = self.get_plan_problems(queryset)
+        self.assertEqual(problems, [], msg=f"\n{queryset.query}\n{plan}")
+
+    def test_public_deals_feed(self):
+        instances = Property.objects.filter(purpose=PropertyPurpose.SALE).exclude(user=self.user)
+        self.assertIndexed(instances.order_by("-created_at")[10:20])
+        self.assertIndexed(instances)
+
+    def test_public_deals_cursor_page(self):
+        now = timezone.now()
+        instances = Property.objects.filter(purpose=PropertyPurpose.SALE).exclude(user=self.user)
+        self.assertIndexed(
+            instances.order_by("-created_at", "-id")
+            .filter(Q(created_at__lt=now) | Q(created_at=now, id__lt=self.user.id))[:11]
+        )
+
+    def test_inventory(self):
+        instances = Property.objects.filter(user=self.user, purpose=PropertyPurpose.SALE)
+        self.assertIndexed(instances.order_by("-created_at")[:10])
+        self.assertIndexed(instances.filter(property_type=PropertyType.HOUSE).order_by("-created_at")[:10])
+
+    def test_wishlist(self):
+        for query_params in ({}, {"deals__property_type": PropertyType.PLOT}):
+            self.assertIndexed(
+                Property.objects.filter(
+                    id__in=self.user.whishlists.filter(**query_params).values_list("deals__id", flat=True),
+                    purpose=PropertyPurpose.REQUIRED,
+                ).order_by("-created_at")[:10]
+            )
+
+    def test_wishlisted_ids_lookup(self):
+        self.assertIndexed(
+            Whishlist.objects.filter(user=self.user, deals_id__in=[self.user.id]).values_list("deals_id", flat=True)
+        )
+
+    def test_place_autocomplete(self):
+        self.assertIndexed(City.objects.filter(prefix_lookup("normalized_name", "la")))
+        self.assertIndexed(
+            Location.objects.filter(prefix_lookup("normalized_name", "d"), city__normalized_name="lahore")
+        )
+
+    def test_filter_deals(self):
+        for property_type, filter_set in DEAL_FILTER_SETS.items():
+            with self.subTest(property_type=property_type):
+                self.assertIndexed(filter_set.filter(QueryDict("purpose=sale"))[:10])
+
+
+@skipUnless(connection.vendor == "postgresql", "PostgreSQL profile only")
+class PostgresCompatTests(TestCase):
+    """Run with DATABASE_PROFILE=postgresql against a local PostgreSQL."""
+
+    def get_wrapper(self, **settings_dict):
+        wrapper = connections["default"].__class__({**connection.settings_dict, **settings_dict}, alias="compat")
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_migrations_applied_and_complete(self):
+        executor = MigrationExecutor(connection)
+        self.assertEqual(executor.migration_plan(executor.loader.graph.leaf_nodes()), [])
+        call_command("makemigrations", "--check", "--dry-run", verbosity=0)
+
+    def test_statement_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT setting FROM pg_settings WHERE name = 'statement_timeout'")
+            self.assertEqual(int(cursor.fetchone()[0]), settings.DATABASE_STATEMENT_TIMEOUT_MS)
+            with self.assertRaises(OperationalError), transaction.atomic():
+                cursor.execute("SET LOCAL statement_timeout = 50")
+                cursor.execute("SELECT pg_sleep(1)")
+
+    def test_health_check_replaces_dead_connection(self):
+        wrapper = self.get_wrapper(CONN_HEALTH_CHECKS=True, CONN_MAX_AGE=60, POOL=None)
+        wrapper.ensure_connection()
+        dead_connection = wrapper.connection
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [dead_connection.get_backend_pid()])
+        # Start of the next request.
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIsNot(wrapper.connection, dead_connection)
+
+    def test_pool_reuses_and_bounds_connections(self):
+        from baselayer.db.postgresql.base import close_pools
+        self.addCleanup(close_pools, "compat")
+        pool_options = {"min_size": 1, "max_size": 1, "timeout": 0.1}
+        wrapper = self.get_wrapper(POOL=pool_options, CONN_MAX_AGE=0)
+        wrapper.ensure_connection()
+        pooled_connection = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, pooled_connection)
+
+        with self.assertRaises(OperationalError):
+            self.get_wrapper(POOL=pool_options, CONN_MAX_AGE=0).ensure_connection()
+
+
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRoutingTests(TestCase):
+    """Routing decisions only; no replica connection is opened."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        UserProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"JWT {self.user.get_access_token()}")
+
+    def get_read_database(self, url):
+        """Read database the view handler of url runs with."""
+        seen = []
+
+        def get(view, request, *args, **kwargs):
+            seen.append(routers._read_database.get())
+            return view.send_success_response(ResponseMessages.SUCCESS)
+
+        with mock.patch.object(views.InventoryView, "get", get):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return seen[0]
+
+    def test_router_sends_writes_to_the_primary(self):
+        router = routers.PrimaryReplicaRouter.__new__(routers.PrimaryReplicaRouter)
+        with routers.read_from("replica"):
+            self.assertEqual(router.db_for_read(Property), "replica")
+            self.assertEqual(router.db_for_write(Property), DEFAULT_DB_ALIAS)
+        self.assertIsNone(router.db_for_read(Property))
+        self.assertFalse(router.allow_migrate("replica", "user_deals"))
+
+    def test_process_local_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            routers.PrimaryReplicaRouter()
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"}}):
+            routers.PrimaryReplicaRouter()
+
+    def test_reads_pinned_to_the_primary_after_a_write(self):
+        url = "/deals/inventory/sale/house/default/1/"
+        self.assertEqual(self.get_read_database(url), "replica")
+
+        response = self.client.patch("/users/profile/", {"fullname": "Dealer", "city": "Lahore"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(routers.is_pinned_to_primary(self.user.pk))
+        self.assertIsNone(self.get_read_database(url))
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post("/deals/wishlist/00000000-0000-0000-0000-000000000000/")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(routers.is_pinned_to_primary(self.user.pk))
+
+    def test_feed_cache_is_filled_from_the_primary(self):
+        seen = []
+
+        def build_feed_window(feed, depth):
+            seen.append(routers._read_database.get())
+            return {"rows": [], "count": 0, "complete": True}
+
+        with mock.patch("user_deals.feed_cache.build_feed_window", build_feed_window):
+            response = self.client.get("/deals/get-public-deals/sale/default/1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS])
+
+
+@override_settings(REPLICA_DATABASE="replica")
+class AsyncReplicaRoutingTests(TransactionTestCase):
+    """ReplicaRoutingTests for the async views, whose database work runs on
+    other threads.
+    """
+    url = "/deals/async/inventory/sale/house/default/1/"
+
+    def setUp(self):
+        patcher = mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create(phone_number="+923001234567")
+        self.client = AsyncClient()
+
+    async def get_read_database(self):
+        seen = []
+
+        def get(view, request, *args, **kwargs):
+            seen.append(routers._read_database.get())
+            return view.send_success_response(ResponseMessages.SUCCESS)
+
+        with mock.patch.object(views.InventoryView, "get", get):
+            response = await self.client.get(self.url, authorization=f"Bearer {self.user.get_access_token()}")
+        self.assertEqual(response.status_code, 200)
+        # Nothing leaks into the context of the caller.
+        self.assertIsNone(routers._read_database.get())
+        return seen[0]
+
+    async def test_reads_from_the_replica(self):
+        self.assertEqual(await self.get_read_database(), "replica")
+
+    async def test_reads_pinned_to_the_primary(self):
+        routers.pin_to_primary(self.user.pk)
+        self.assertIsNone(await self.get_read_database())
+
+
+def create_property(user, **kwargs):
+    fields = dict(
+        title="House", description="", purpose=PropertyPurpose.SALE, property_type=PropertyType.HOUSE,
+        category="", city="Lahore", location="DHA", marla=5, contact_name="", contact_number="",
+    )
+    fields.update(kwargs)
+    return Property.objects.create(user=user, **fields)
+
+
+def create_house(user, bedrooms=3, bathrooms=2, **kwargs):
+    instance = create_property(user, **kwargs)
+    PropertyHouse.objects.create(property=instance, house="", street="", bedrooms=bedrooms, bathrooms=bathrooms)
+    return instance
+
+
+def create_plot(user, series_from, series_to, **kwargs):
+    instance = create_property(user, property_type=PropertyType.PLOT, **kwargs)
+    PropertyPlot.objects.create(property=instance, series_from=series_from, series_to=series_to)
+    return instance
+
+
+class FeedCacheInvalidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generation_is_bumped_after_commit(self):
+        before = feed_cache.get_generation(PropertyPurpose.SALE)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_property(self.user)
+            # A feed rebuilt now would still read the old rows.
+            self.assertEqual(feed_cache.get_generation(PropertyPurpose.SALE), before)
+        self.assertGreater(feed_cache.get_generation(PropertyPurpose.SALE), before)
+
+    def test_generation_is_shared_through_the_database(self):
+        feed_cache.bump_generation(PropertyPurpose.SALE)
+        generation = feed_cache.get_generation(PropertyPurpose.SALE)
+        # As seen by another worker, with a cache of its own.
+        cache.clear()
+        self.assertEqual(feed_cache.get_generation(PropertyPurpose.SALE), generation)
+        feed_cache.bump_generation()
+        self.assertEqual(feed_cache.get_generation(PropertyPurpose.SALE), generation + 1)
+        self.assertEqual(FeedGeneration.objects.count(), len(PropertyPurpose.values))
+
+
+@mock.patch("user_deals.outbox.find_counterpart_fcm_tokens", return_value=["token-1", "token-2"])
+@mock.patch("user_deals.outbox.send_firebase_multicast")
+@override_settings(FCM_BATCH_SIZE=1)
+class OutboxLeaseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+
+    def setUp(self):
+        self.event = outbox.enqueue_deal_created(create_property(self.user))
+
+    def claim(self):
+        self.assertTrue(outbox.claim_event(self.event.id))
+        return DealEventOutbox.objects.select_related("property").get(id=self.event.id)
+
+    def test_claimed_event_is_sent(self, send_firebase_multicast, find_tokens):
+        send_firebase_multicast.return_value = {"success": 1, "failure": 0, "multicast_ids": [1], "results": []}
+        self.assertEqual(outbox.process_event(self.claim()), OutboxStatus.SENT)
+        self.assertEqual(send_firebase_multicast.call_count, 2)
+
+    def test_no_batch_is_sent_after_the_lease_is_lost(self, send_firebase_multicast, find_tokens):
+        event = self.claim()
+
+        def lose_lease(**kwargs):
+            # The lease expires during the first batch and another worker claims the event.
+            DealEventOutbox.objects.filter(id=event.id).update(attempts=F("attempts") + 1)
+            return {"success": 1, "failure": 0, "multicast_ids": [1], "results": []}
+
+        send_firebase_multicast.side_effect = lose_lease
+        with self.assertRaises(outbox.LeaseLost):
+            outbox.process_event(event)
+        self.assertEqual(send_firebase_multicast.call_count, 1)
+
+
+class AsyncViewTests(TransactionTestCase):
+    """Async routes end to end; their database work runs on other threads,
+    so the data is committed.
+    """
+    url = "/deals/async/inventory/sale/default/default/1/"
+
+    def setUp(self):
+        # The pool threads close their connections after each call, or the
+        # test database could not be dropped at the end of the run.
+        patcher = mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create(phone_number="+923001234567")
+        UserProfile.objects.create(user=self.user)
+        self.property = create_property(self.user)
+        self.client = AsyncClient()
+
+    async def test_inventory(self):
+        initial = views.AsyncInventoryView.initial
+        threads = []
+
+        def record_thread(view, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return initial(view, *args, **kwargs)
+
+        with mock.patch.object(views.AsyncInventoryView, "initial", record_thread):
+            # Django 3.2's AsyncClient takes headers by their ASGI names.
+            response = await self.client.get(self.url, authorization=f"Bearer {self.user.get_access_token()}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([deal["id"] for deal in response.json()["payload"]["data"]], [str(self.property.id)])
+        # Permissions and throttles are checked off the event loop.
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("async-db"))
+
+    async def test_inventory_needs_authentication(self):
+        response = await self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class SoftDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        UserProfile.objects.create(user=cls.user)
+        cls.property = create_property(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+        self.url = f"/deals/wishlist/{self.property.id}/"
+
+    def test_wishlist_remove_and_add_again(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        wishlist = Whishlist.objects.get(user=self.user, deals=self.property)
+
+        self.assertEqual(self.client.delete(self.url).status_code, 200)
+        self.assertFalse(Whishlist.objects.filter(user=self.user).exists())
+        self.assertTrue(Whishlist.all_objects.get(id=wishlist.id).is_deleted)
+
+        # The removed row is revived instead of duplicated.
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(list(Whishlist.all_objects.values_list("id", "is_deleted")), [(wishlist.id, False)])
+
+    def test_soft_delete_by_queryset_drops_deals_from_feeds_and_matches(self):
+        viewer = User.objects.create(phone_number="+923007654321")
+        UserProfile.objects.create(user=viewer)
+        ticket = create_property(viewer, purpose=PropertyPurpose.REQUIRED)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {viewer.get_access_token()}")
+        cache.clear()
+
+        def get_feed_ids():
+            response = client.get("/deals/get-public-deals/sale/default/1/")
+            # An empty feed answers "Not found." without data.
+            return [deal["id"] for deal in response.json()["payload"].get("data", [])]
+
+        self.assertEqual(get_feed_ids(), [str(self.property.id)])
+        self.assertIn(self.user, find_counterpart_owners(ticket))
+        Whishlist.objects.create(user=viewer, deals=self.property)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Property.objects.filter(id=self.property.id).soft_delete(), 1)
+        self.assertEqual(get_feed_ids(), [])
+        self.assertNotIn(self.user, find_counterpart_owners(ticket))
+        # Wishlist rows of the deal are kept, for a revival, but hidden.
+        self.assertFalse(Whishlist.objects.filter(user=viewer).exists())
+        self.assertTrue(Whishlist.all_objects.filter(user=viewer).exists())
+
+    def test_purge_soft_deleted(self):
+        old, recent = create_property(self.user), create_property(self.user)
+        Whishlist.objects.create(user=self.user, deals=old)
+        Property.objects.filter(id__in=[old.id, recent.id]).soft_delete()
+        Property.all_objects.filter(id=old.id).update(modified_at=timezone.now() - timedelta(days=31))
+
+        call_command("purge_soft_deleted", pause=0, stdout=io.StringIO())
+        self.assertEqual(
+            set(Property.all_objects.values_list("id", flat=True)), {self.property.id, recent.id}
+        )
+        # Cascaded with the purged deal.
+        self.assertFalse(Whishlist.all_objects.filter(deals=old).exists())
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        cls.in_title = create_property(cls.user, title="Corner house in Gulberg")
+        cls.in_description = create_property(cls.user, title="House", description="Near the Gulberg market")
+        cls.other = create_property(cls.user, title="Plot", city="Karachi", location="Clifton")
+        UserProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_feed(self, search_title, query_string=""):
+        viewer = User.objects.create(phone_number="+923007654321")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {viewer.get_access_token()}")
+        return client.get(f"/deals/get-public-deals/sale/{search_title}/1/{query_string}")
+
+    def get_feed_ids(self, search_title):
+        response = self.get_feed(search_title)
+        self.assertEqual(response.status_code, 200)
+        return [deal["id"] for deal in response.json()["payload"]["data"]]
+
+    def test_feed_search(self):
+        self.assertEqual(self.get_feed_ids("gulb"), [str(self.in_title.id), str(self.in_description.id)])
+
+    def test_cursor_is_rejected_with_a_search(self):
+        response = self.get_feed("gulb", "?cursor=")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], ResponseMessages.INVALID_CURSOR)
+
+    def test_feed_punctuation_search_is_unfiltered(self):
+        self.assertEqual(len(self.get_feed_ids("!!!")), 3)
+
+    def test_best_match_first(self):
+        results = search_properties(Property.objects.all(), "gulb")
+        self.assertEqual(list(results), [self.in_title, self.in_description])
+
+    def test_blank_search_is_unfiltered(self):
+        for search_text in ("", "  ", "!!!"):
+            with self.subTest(search_text=search_text):
+                self.assertEqual(search_properties(Property.objects.all(), search_text).count(), 3)
+
+    def test_index_follows_updates(self):
+        Property.objects.filter(id=self.other.id).update(title="Gulberg plot")
+        self.assertIn(self.other, search_properties(Property.objects.all(), "gulberg"))
+        Property.all_objects.filter(id=self.other.id).delete()
+        self.assertEqual(search_properties(Property.objects.all(), "gulberg").count(), 2)
+
+
+class FilterDealsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        UserProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+
+    def test_non_finite_prices_are_rejected(self):
+        for param in ("price_from", "price_to", "price_min", "price_max", "price", "price_tolerance"):
+            for value in ("NaN", "sNaN", "Infinity", "-inf"):
+                with self.subTest(param=param, value=value):
+                    params = {"property_type": PropertyType.HOUSE, "price": "1000", param: value}
+                    response = self.client.get("/deals/filter/1/", params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json()["message"], ResponseMessages.INVALID_FILTER)
+
+    def get_ids(self, params, page=1):
+        response = self.client.get(f"/deals/filter/{page}/", {"property_type": PropertyType.HOUSE, **params})
+        self.assertEqual(response.status_code, 200)
+        return [entry["property"] for entry in response.json()["payload"].get("data", [])]
+
+    def test_multi_value_and_range_filters(self):
+        small = create_house(self.user, marla=5, bedrooms=2, purpose=PropertyPurpose.SALE)
+        medium = create_house(self.user, marla=10, bedrooms=3, purpose=PropertyPurpose.RENT)
+        large = create_house(self.user, marla=20, bedrooms=5, purpose=PropertyPurpose.REQUIRED)
+        self.assertEqual(self.get_ids({"marla": ["5", "20"]}), [str(large.id), str(small.id)])
+        self.assertEqual(self.get_ids({"marla_min": "6", "marla_max": "20"}), [str(large.id), str(medium.id)])
+        self.assertEqual(self.get_ids({"bedrooms_min": "3", "ordering": "marla"}), [str(medium.id), str(large.id)])
+        self.assertEqual(self.get_ids({"purpose": ["sale", "rent"], "bedrooms_max": "2"}), [str(small.id)])
+
+    def test_purpose_matches_substrings(self):
+        sale = create_house(self.user, purpose=PropertyPurpose.SALE)
+        required = create_house(self.user, purpose=PropertyPurpose.REQUIRED)
+        self.assertEqual(self.get_ids({"purpose": "SAL"}), [str(sale.id)])
+        self.assertEqual(self.get_ids({"purpose": "re"}), [str(required.id)])
+        self.assertEqual(self.get_ids({"purpose": "e"}), [str(required.id), str(sale.id)])
+        self.assertEqual(self.get_ids({"purpose": "lease"}), [])
+
+    def test_price_overlap(self):
+        low = create_house(self.user, from_price=100, to_price=200)
+        high = create_house(self.user, from_price=300, to_price=400)
+        single = create_house(self.user, total_price=150)
+        expensive = create_house(self.user, total_price=1000)
+
+        def matches(**params):
+            return set(self.get_ids(params))
+
+        self.assertEqual(matches(price_min="150", price_max="350"), {str(low.id), str(high.id), str(single.id)})
+        # Bounds are inclusive.
+        self.assertEqual(matches(price_min="200", price_max="300"), {str(low.id), str(high.id)})
+        self.assertEqual(matches(price_min="201", price_max="299"), set())
+        self.assertEqual(matches(price_max="150"), {str(low.id), str(single.id)})
+        self.assertEqual(matches(price_min="350"), {str(high.id), str(expensive.id)})
+
+    def test_price_tolerance(self):
+        below = create_house(self.user, total_price=900)
+        exact = create_house(self.user, total_price=1000)
+        above = create_house(self.user, total_price=1100)
+        create_house(self.user, total_price=1101)
+        create_house(self.user, from_price=950, to_price=1050)
+
+        def matches(**params):
+            return set(self.get_ids(params))
+
+        self.assertEqual(matches(price="1000"), {str(below.id), str(exact.id), str(above.id)})
+        self.assertEqual(matches(price="1000", price_tolerance="0"), {str(exact.id)})
+        self.assertEqual(matches(price="1000", price_tolerance="9.99"), {str(exact.id)})
+        for tolerance in ("-1", "101"):
+            response = self.client.get("/deals/filter/1/", {
+                "property_type": PropertyType.HOUSE, "price": "1000", "price_tolerance": tolerance,
+            })
+            self.assertEqual(response.status_code, 400)
+
+    def test_page_query_count(self):
+        for marla in range(1, 13):
+            Whishlist.objects.create(user=self.user, deals=create_house(self.user, marla=marla))
+        self.get_ids({})  # Loads the user into the authentication cache.
+        for page in (1, 2):
+            with self.subTest(page=page), self.assertNumQueries(3):
+                # Count, page with the subtype joined, wishlisted ids.
+                ids = self.get_ids({"marla_min": "1", "bedrooms": "3", "purpose": "sale"}, page)
+            self.assertEqual(len(ids), 10 if page == 1 else 2)
+
+
+class PlaceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+
+    def get_names(self, path, params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return [entry["name"] for entry in response.json()["payload"]["data"]]
+
+    def test_spelling_variants_share_places(self):
+        first = create_property(self.user, city=" Lahore ", location="DHA  Phase 5")
+        second = create_property(self.user, city="LAHORE", location="dha phase 5")
+        self.assertEqual(first.city_ref, second.city_ref)
+        self.assertEqual(first.location_ref, second.location_ref)
+        self.assertEqual((first.city_ref.name, first.city_ref.normalized_name), ("Lahore", "lahore"))
+        # Case folding may lengthen a name past the 50 characters of city.
+        self.assertEqual(create_property(self.user, city="ß" * 50).city_ref.normalized_name, "ss" * 50)
+
+    def test_places_follow_update_fields(self):
+        instance = create_property(self.user)
+        instance.city, instance.location = "Karachi", "Clifton"
+        instance.save(update_fields=["city", "location"])
+        instance = Property.objects.select_related("city_ref", "location_ref").get(id=instance.id)
+        self.assertEqual(instance.city_ref.normalized_name, "karachi")
+        self.assertEqual(instance.location_ref.normalized_name, "clifton")
+
+    def test_autocomplete(self):
+        for city, location in (("Lahore", "DHA"), ("Lahore", "Defence"), ("Lahore", "Gulberg"),
+                               ("Larkana", "Bunder Road"), ("Islamabad", "DHA")):
+            create_property(self.user, city=city, location=location)
+        self.assertEqual(self.get_names("/deals/autocomplete/cities/", {"q": " LA"}), ["Lahore", "Larkana"])
+        self.assertEqual(self.get_names("/deals/autocomplete/cities/", {"q": "lah"}), ["Lahore"])
+        self.assertEqual(self.get_names("/deals/autocomplete/cities/", {"q": "x"}), [])
+        self.assertEqual(
+            self.get_names("/deals/autocomplete/locations/", {"city": "lahore ", "q": "d"}), ["Defence", "DHA"]
+        )
+        self.assertEqual(
+            self.get_names("/deals/autocomplete/locations/", {"city": "Islamabad", "q": ""}), ["DHA"]
+        )
+        response = self.client.get("/deals/autocomplete/locations/", {"q": "d"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], ResponseMessages.CITY_MISSING)
+
+    def test_filter_matches_whole_place_names(self):
+        lahore = create_house(self.user, city="Lahore", location="DHA Phase 5")
+        create_house(self.user, city="Lahore Cantt", location="DHA")
+        islamabad = create_house(self.user, city="Islamabad", location="DHA")
+        filter_set = DEAL_FILTER_SETS[PropertyType.HOUSE]
+
+        def filter_ids(query_string):
+            return set(filter_set.filter(QueryDict(query_string)).values_list("id", flat=True))
+
+        self.assertEqual(filter_ids("city=%20LAHORE"), {lahore.id})
+        self.assertEqual(filter_ids("city=lahore&location=dha%20%20phase%205"), {lahore.id})
+        self.assertEqual(filter_ids("city=Lahore&city=Islamabad"), {lahore.id, islamabad.id})
+        self.assertEqual(filter_ids("city=lah"), set())
+
+
+class SeriesRangeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        UserProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+
+    def get_series(self, params):
+        response = self.client.get("/deals/filter/1/", {"property_type": PropertyType.PLOT, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(entry["series_from"], entry["series_to"]) for entry in response.json()["payload"]["data"]]
+
+    def test_series_compare_as_numbers(self):
+        create_plot(self.user, "900", "950")
+        create_plot(self.user, "1005", "1200")
+        create_plot(self.user, "r12", "r90")
+        self.assertEqual(self.get_series({"series_from": "100"}), [("1005", "1200"), ("900", "950")])
+        self.assertEqual(self.get_series({"series_to": "1000"}), [("r12", "r90"), ("900", "950")])
+        self.assertEqual(self.get_series({"series_from": "Block 10", "series_to": "100"}), [("r12", "r90")])
+        response = self.client.get("/deals/filter/1/", {"property_type": PropertyType.PLOT, "series_from": "A"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], ResponseMessages.INVALID_FILTER)
+
+    def test_series_numbers_are_not_exposed(self):
+        create_plot(self.user, "10", "20")
+        response = self.client.get("/deals/filter/1/", {"property_type": PropertyType.PLOT})
+        entry = response.json()["payload"]["data"][0]
+        self.assertEqual((entry["series_from"], entry["series_to"]), ("10", "20"))
+        self.assertNotIn("series_from_number", entry)
+        self.assertNotIn("series_to_number", entry)
+
+    def test_series_numbers_follow_update_fields(self):
+        plot = create_plot(self.user, "10", "20").propertyplot
+        plot.series_from, plot.series_to = "30", "n/a"
+        plot.save(update_fields=["series_from", "series_to"])
+        plot.refresh_from_db()
+        self.assertEqual((plot.series_from_number, plot.series_to_number), (30, None))
+
+    def test_backfill_series_numbers(self):
+        numeric = create_plot(self.user, "1005", "2000").propertyplot
+        mixed = create_plot(self.user, "Block r12", "14-B").propertyplot
+        non_numeric = create_plot(self.user, "A", "n/a").propertyplot
+        PropertyPlot.objects.update(series_from_number=None, series_to_number=None)
+        commercial = PropertyComercial.objects.create(
+            property=create_property(self.user, property_type=PropertyType.COMMERCIAL),
+            series_from="7", series_to="", bedrooms=0, bathrooms=0,
+        )
+        stdout = io.StringIO()
+        call_command("backfill_series_numbers", batch_size=2, stdout=stdout)
+        numbers = {
+            instance.id: (instance.series_from_number, instance.series_to_number)
+            for model in (PropertyPlot, PropertyComercial) for instance in model.objects.all()
+        }
+        self.assertEqual(numbers, {
+            numeric.id: (1005, 2000),
+            mixed.id: (12, 14),
+            non_numeric.id: (None, None),
+            commercial.id: (7, None),
+        })
+        self.assertIn("for 3 'PropertyPlot' rows", stdout.getvalue())
+        self.assertIn("for 1 'PropertyComercial' rows", stdout.getvalue())
+
+
+class PropertyMetaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+
+    def test_meta_of_a_page_is_one_query_per_subtype(self):
+        houses = [create_house(self.user, bedrooms=bedrooms) for bedrooms in range(1, 6)]
+        plots = [create_plot(self.user, str(number), str(number + 10)) for number in range(5)]
+        commercial = create_property(self.user, property_type=PropertyType.COMMERCIAL)
+        PropertyComercial.objects.create(property=commercial, series_from="1", series_to="2", bedrooms=1, bathrooms=1)
+        bare = create_property(self.user)
+        with self.assertNumQueries(3):
+            meta = get_property_meta([*houses, *plots, commercial, bare])
+        self.assertEqual(len(meta), 11)
+        self.assertEqual(meta[houses[2].id], {"house": "", "street": "", "bedrooms": 3, "bathrooms": 2})
+        self.assertEqual(meta[plots[1].id], {"series_from": "1", "series_to": "11"})
+        self.assertEqual(
+            meta[commercial.id], {"series_from": "1", "series_to": "2", "bedrooms": 1, "bathrooms": 1}
+        )
+        self.assertNotIn(bare.id, meta)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_property_meta([]), {})
+
+
+class WishlistedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        cls.other_user = User.objects.create(phone_number="+923007654321")
+
+    def test_page_flags_come_from_one_query(self):
+        properties = [create_property(self.other_user) for _ in range(4)]
+        for instance in properties[1:3]:
+            Whishlist.objects.create(user=self.user, deals=instance)
+        Whishlist.objects.create(user=self.other_user, deals=properties[3])
+        with self.assertNumQueries(1):
+            wishlisted_ids = get_wishlisted_property_ids(self.user, [instance.id for instance in properties])
+        with self.assertNumQueries(0):
+            data = PropertyGenericSerializer(properties, many=True, context={
+                "user": self.user, "property_meta": {}, "wishlisted_ids": wishlisted_ids,
+            }).data
+        self.assertEqual([row["is_wishlisted"] for row in data], [False, True, True, False])
+
+    def test_no_query_without_user_or_page(self):
+        instance = create_property(self.other_user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_wishlisted_property_ids(AnonymousUser(), [instance.id]), set())
+            self.assertEqual(get_wishlisted_property_ids(self.user, []), set())
+
+
+class CursorPaginationTests(TestCase):
+    url = "/deals/get-public-deals/sale/default/1/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number="+923001234567")
+        owner = User.objects.create(phone_number="+923007654321")
+        properties = [create_property(owner) for _ in range(25)]
+        # Ties on created_at are broken by id.
+        Property.objects.filter(id__in=[instance.id for instance in properties[5:15]]).update(
+            created_at=properties[5].created_at
+        )
+        create_property(cls.user)
+        cls.expected_ids = [
+            str(pk) for pk in Property.objects.exclude(user=cls.user).order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+
+    def get_page(self, cursor):
+        response = self.client.get(self.url, {"cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()["payload"]
+        return [row["id"] for row in payload["data"]], payload["pagination"]
+
+    def test_next_and_previous_round_trip(self):
+        pages = []
+        cursor = ""
+        while cursor is not None:
+            ids, pagination = self.get_page(cursor)
+            pages.append(ids)
+            self.assertEqual(pagination["has_previous"], len(pages) > 1)
+            cursor = pagination["next_cursor"]
+        self.assertEqual([len(ids) for ids in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.expected_ids)
+
+        cursor = pagination["previous_cursor"]
+        for expected in reversed(pages[:-1]):
+            ids, pagination = self.get_page(cursor)
+            self.assertEqual(ids, expected)
+            cursor = pagination["previous_cursor"]
+        self.assertIsNone(cursor)
+        self.assertTrue(pagination["has_next"])
+
+    def test_tampered_cursor(self):
+        _, pagination = self.get_page("")
+        cursor = pagination["next_cursor"]
+        forged = base64.urlsafe_b64encode(b"x|2026-01-01T00:00:00|" + b"0" * 32).decode()
+        for tampered in (cursor[:-3], cursor[:4] + "!" + cursor[5:], forged, "not a cursor"):
+            with self.subTest(cursor=tampered):
+                response = self.client.get(self.url, {"cursor": tampered})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["message"], ResponseMessages.INVALID_CURSOR)
+
+
+class MatchingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create(phone_number="+923001234567")
+        cls.sellers = [
+            User.objects.create(phone_number=f"+92300765432{number}", fcm_token=f"token-{number}")
+            for number in range(6)
+        ]
+        phase_5, phase_6, gulberg, plot, karachi, no_token = cls.sellers
+        no_token.fcm_token = ""
+        no_token.save()
+        create_property(phase_5, city="Lahore", location="DHA Phase 5")
+        create_property(phase_6, city="lahore ", location="Phase 6, DHA")
+        create_property(gulberg, city="Lahore", location="Gulberg")
+        create_property(plot, city="Lahore", location="DHA Phase 5", property_type=PropertyType.PLOT)
+        create_property(karachi, city="Karachi", location="DHA Phase 5")
+        create_property(no_token, city="Lahore", location="DHA")
+        # Tickets of the same purpose, or the buyer's own, never match.
+        create_property(cls.buyer, city="Lahore", location="DHA Phase 5")
+        create_property(phase_5, city="Lahore", location="DHA", purpose=PropertyPurpose.REQUIRED)
+
+    def match(self, location, **kwargs):
+        ticket = create_property(
+            self.buyer, city="LAHORE", location=location, purpose=PropertyPurpose.REQUIRED, **kwargs
+        )
+        return {self.sellers.index(user) for user in find_counterpart_owners(ticket)}
+
+    def test_location_words_must_all_match(self):
+        self.assertEqual(self.match("dha"), {0, 1, 5})
+        self.assertEqual(self.match("Phase 5 DHA"), {0})
+        self.assertEqual(self.match("DHA phase"), {0, 1})
+        self.assertEqual(self.match("Bahria"), set())
+
+    def test_city_wide_ticket(self):
+        self.assertEqual(self.match(""), {0, 1, 2, 5})
+        self.assertEqual(self.match("", property_type=PropertyType.PLOT), {3})
+
+    def test_reindexed_on_save(self):
+        gulberg = Property.objects.get(user=self.sellers[2])
+        gulberg.location = "DHA Phase 5"
+        gulberg.save()
+        self.assertEqual(self.match("DHA Phase 5"), {0, 2})
+
+    def test_fcm_tokens(self):
+        ticket = create_property(self.buyer, city="Lahore", location="DHA", purpose=PropertyPurpose.REQUIRED)
+        self.assertCountEqual(find_counterpart_fcm_tokens(ticket), ["token-0", "token-1"])
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite profile only")
+class SQLitePragmaTests(TestCase):
+
+    def test_pragmas_are_applied_on_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, "NAME": os.path.join(directory, "pragmas.sqlite3")}
+            new_connection = connections[DEFAULT_DB_ALIAS].__class__(settings_dict, alias="pragma-check")
+            try:
+                with new_connection.cursor() as cursor:
+                    values = {}
+                    for name in settings_dict["PRAGMAS"]:
+                        cursor.execute(f"PRAGMA {name}")
+                        values[name] = cursor.fetchone()[0]
+            finally:
+                new_connection.close()
+        pragmas = settings_dict["PRAGMAS"]
+        self.assertEqual(values, {
+            "busy_timeout": pragmas["busy_timeout"],
+            "journal_mode": "wal",
+            # NORMAL
+            "synchronous": 1,
+            "cache_size": pragmas["cache_size"],
+            "mmap_size": pragmas["mmap_size"],
+        })
+
+
+class UUID7Tests(TestCase):
+
+    def test_ids_are_time_ordered(self):
+        before = time.time_ns() // 1_000_000
+        ids = [basemodels.uuid7() for _ in range(10000)]
+        after = time.time_ns() // 1_000_000
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual({(pk.version, pk.variant) for pk in ids}, {(7, uuid.RFC_4122)})
+        self.assertLessEqual(before, ids[0].int >> 80)
+        # Past 2048 ids in a millisecond the counter borrows the next one.
+        self.assertLessEqual(ids[-1].int >> 80, after + len(ids) // 2048 + 1)
+
+    def test_ids_stay_ordered_when_the_clock_stalls_or_goes_back(self):
+        now = time.time_ns()
+        clock = iter([now] * 5000 + [now - 10 ** 9] * 10 + [now + 10 ** 9])
+        with mock.patch.object(basemodels.time, "time_ns", lambda: next(clock)):
+            ids = [basemodels.uuid7() for _ in range(5011)]
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids[-1].int >> 80, (now + 10 ** 9) // 1_000_000)
+
+    def test_rows_are_ordered_by_creation(self):
+        user = User.objects.create(phone_number="+923001234567")
+        properties = [create_property(user) for _ in range(20)]
+        self.assertEqual(
+            list(Property.objects.order_by("id").values_list("id", flat=True)),
+            [instance.id for instance in properties],
+        )
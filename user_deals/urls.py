@@ -6,7 +6,13 @@ from user_deals.views import (
     FilterDealsView,
     CommercialDealsView,
     WishlistView,
-    InventoryView
+    InventoryView,
+    CityAutocompleteView,
+    LocationAutocompleteView,
+    AsyncPublicDealsView,
+    AsyncFilterDealsView,
+    AsyncWishlistView,
+    AsyncInventoryView,
     )
 
 urlpatterns = [
@@ -18,4 +24,11 @@ urlpatterns = [
     path("wishlist/<str:deal_type>/<str:property_type>/<str:search_title>/<int:page>/", WishlistView.as_view(), name="wishlist"),
     path("wishlist/<uuid:property_id>/", WishlistView.as_view(), name="wishlist"),
     path("inventory/<str:deal_type>/<str:property_type>/<str:search_title>/<int:page>/", InventoryView.as_view(), name="inventory"),
+    path("autocomplete/cities/", CityAutocompleteView.as_view(), name="autocomplete-cities"),
+    path("autocomplete/locations/", LocationAutocompleteView.as_view(), name="autocomplete-locations"),
+    # Async variants of the read endpoints, for ASGI deployments.
+    path("async/get-public-deals/<str:deal_type>/<str:search_title>/<int:page>/", AsyncPublicDealsView.as_view(), name="async-available-deals"),
+    path("async/filter/<int:page>/", AsyncFilterDealsView.as_view(), name="async-filter-deal"),
+    path("async/wishlist/<str:deal_type>/<str:property_type>/<str:search_title>/<int:page>/", AsyncWishlistView.as_view(), name="async-wishlist"),
+    path("async/inventory/<str:deal_type>/<str:property_type>/<str:search_title>/<int:page>/", AsyncInventoryView.as_view(), name="async-inventory"),
 ]
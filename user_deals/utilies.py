@@ -1,4 +1,24 @@
+import base64
+import binascii
+import uuid
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from baselayer.db.lookups import Prefix
+from user_deals.models import PropertyComercial, PropertyHouse, PropertyPlot, Whishlist
+from user_deals.search import is_search_result
+
+# Subtype tables in the order they are resolved for a property, with the
+# columns exposed as its "meta".
+PROPERTY_META_MODELS = (
+    (PropertyHouse, ("house", "street", "bedrooms", "bathrooms")),
+    (PropertyPlot, ("series_from", "series_to")),
+    (PropertyComercial, ("series_from", "series_to", "bedrooms", "bathrooms")),
+)
+
+CURSOR_NEXT = "n"
+CURSOR_PREVIOUS = "p"
 
 def custom_pagination(instances, page_number, per_page=10):
     paginator = Paginator(object_list = instances, per_page=per_page)
@@ -12,4 +32,114 @@ def custom_pagination(instances, page_number, per_page=10):
         "has_previous": page.has_previous()
     }
     entries = page.object_list
-    return entries, pagination
\ No newline at end of file
+    return entries, pagination
+
+
+def encode_cursor(direction, instance):
+    """Build an opaque cursor pointing at instance's (created_at, id) position."""
+    raw = f"{direction}|{instance.created_at.isoformat()}|{instance.id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Parse a cursor built by encode_cursor.
+    :raise ValueError: when the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        direction, created_at, pk = raw.split("|")
+        created_at = parse_datetime(created_at)
+        pk = uuid.UUID(hex=pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise ValueError(f"Invalid cursor: {cursor}") from err
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or created_at is None:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return direction, created_at, pk
+
+
+def cursor_pagination(instances, cursor=None, per_page=10):
+    """Keyset pagination over (-created_at, -id).
+    Fetches per_page + 1 rows from the cursor position, so the cost does not
+    depend on how deep the page is and no count query is needed.
+    :param instances: queryset of LogsMixin rows
+    :param cursor: cursor from a previous response, None for the first page
+    :return: entries, pagination
+    """
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None and position[0] == CURSOR_PREVIOUS:
+        _, created_at, pk = position
+        entries = list(
+            instances.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by("created_at", "id")[:per_page + 1]
+        )
+        has_previous = len(entries) > per_page
+        has_next = True
+        entries = entries[:per_page][::-1]
+    else:
+        instances = instances.order_by("-created_at", "-id")
+        if position is not None:
+            _, created_at, pk = position
+            instances = instances.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        entries = list(instances[:per_page + 1])
+        has_next = len(entries) > per_page
+        has_previous = position is not None
+        entries = entries[:per_page]
+    pagination = {
+        "next_cursor": encode_cursor(CURSOR_NEXT, entries[-1]) if has_next and entries else None,
+        "previous_cursor": encode_cursor(CURSOR_PREVIOUS, entries[0]) if has_previous and entries else None,
+        "has_next": has_next,
+        "has_previous": has_previous
+    }
+    return entries, pagination
+
+
+def paginate_deals(request, instances, page_number, per_page=10):
+    """Paginate deals by page number, or by keyset when the request sends a
+    ``cursor`` query param (empty for the first page).
+    :raise ValueError: when the cursor is malformed, or sent with a search
+    """
+    if "cursor" in request.GET:
+        if is_search_result(instances):
+            # Keyset pages follow created_at, which would drop the rank order.
+            raise ValueError("Cursor pagination is not available for search results")
+        return cursor_pagination(instances, request.GET.get("cursor"), per_page)
+    return custom_pagination(instances, page_number, per_page)
+
+
+def get_property_meta(properties):
+    """Resolve subtype meta for a page of properties.
+    Runs one query per subtype table regardless of the page size.
+    :param properties: iterable of Property instances
+    :return: dict mapping property id to its meta dict
+    """
+    property_ids = [instance.id for instance in properties]
+    meta = {}
+    if not property_ids:
+        return meta
+    for model, fields in PROPERTY_META_MODELS:
+        for row in model.objects.filter(property_id__in=property_ids).values("property_id", *fields):
+            meta.setdefault(row.pop("property_id"), row)
+    return meta
+
+
+def get_wishlisted_property_ids(user, property_ids):
+    """Load which of the given properties the user has wishlisted, in one query.
+    :param user: requesting user
+    :param property_ids: ids of the properties on the current page
+    :return: set of wishlisted property ids
+    """
+    property_ids = list(property_ids)
+    if not property_ids or user is None or not user.is_authenticated:
+        return set()
+    return set(
+        Whishlist.objects.filter(user=user, deals_id__in=property_ids).values_list("deals_id", flat=True)
+    )
+
+
+def prefix_lookup(field, prefix):
+    """Condition matching values of field that start with prefix.
+    On SQLite it is an index range scan (see baselayer/db/lookups.py); on
+    PostgreSQL it needs a text_pattern_ops index on the field (see City and
+    Location) unless the database uses the C collation.
+    """
+    return Q(**{f"{field}__{Prefix.lookup_name}": prefix})
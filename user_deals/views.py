@@ -1,25 +1,35 @@
+from django.db import transaction
 from rest_framework.permissions import IsAuthenticated
-from baselayer.baseapiviews import BaseAPIView
+from baselayer.asyncviews import AsyncBaseAPIView, database_sync_to_async
+from baselayer.baseapiviews import BaseAPIView, ReplicaReadMixin
 from baselayer.baseauthentication import JWTAuthentication
-from user_deals.utilies import custom_pagination
+from user_deals.feed_cache import get_cached_feed_page
+from user_deals.filters import DEAL_FILTER_SETS
+from user_deals.outbox import enqueue_deal_created
+from user_deals.search import search_properties
+from user_deals.utilies import (
+    custom_pagination,
+    get_property_meta,
+    get_wishlisted_property_ids,
+    paginate_deals,
+    prefix_lookup
+)
 from utils.baseutils import get_first_error_message_from_serializer_errors
 from utils.mock_responses import ResponseMessages
 from user_deals.serializers import (
-    FilterPlotSerializer,
     PropertyGenericSerializer,
     PropertyHouseSerializer,
     PropertyPlotSerializer,
     PropertyComercialSerializer,
-    FilterHouseSerializer, FilterCommercialSerializer
+    FilterHouseSerializer
 )
 from user_deals.models import (
+    City,
+    Location,
     Property,
-    PropertyHouse,
-    PropertyPlot,
-    PropertyType,
     Whishlist,
-    PropertyComercial,
-    PropertyPurpose
+    PropertyPurpose,
+    normalize_place_name
 )
 
 # Create your views here.
@@ -88,8 +98,10 @@ class HouseDealsView(BaseAPIView):
                 )
             )
     
-        ticket = serializer_data.save()
-        configure_firebase_notification(ticket)
+        # Matching users are notified by process_notification_outbox.
+        with transaction.atomic():
+            ticket = serializer_data.save()
+            enqueue_deal_created(ticket)
         return self.send_success_response(
             message=ResponseMessages.TICKET_CREATED,
             payload= self.serializer_class(ticket).data
@@ -163,7 +175,7 @@ class PlotDealsView(BaseAPIView):
         )
 
 
-class PublicDealsView(BaseAPIView):
+class PublicDealsView(ReplicaReadMixin, BaseAPIView):
     """Public Deals"""
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
@@ -176,19 +188,38 @@ class PublicDealsView(BaseAPIView):
         page_number = kwargs['page']
         search_title = kwargs["search_title"]
 
-        if not search_title == "default":
-            query_params["title__icontains"] = search_title
-
         query_params.update({
             "purpose": deal_type,
         })
 
-        instances = self.queryset.filter(**query_params).exclude(user=request.user).order_by('-created_at')
-        if not instances:
+        feed = self.queryset.filter(**query_params).order_by('-created_at')
+        if not search_title == "default":
+            feed = search_properties(feed, search_title)
+
+        if "cursor" not in request.GET:
+            cached_page = get_cached_feed_page(feed, request.user, deal_type, search_title, page_number, 10)
+            if cached_page is not None:
+                rows, pagination = cached_page
+                if not rows:
+                    return self.send_success_response(ResponseMessages.NOT_FOUND)
+                return self.send_success_response(ResponseMessages.SUCCESS, {
+                    "data": rows,
+                    "pagination": pagination
+                })
+
+        instances = feed.exclude(user=request.user)
+        if not instances.exists():
             return self.send_success_response(ResponseMessages.NOT_FOUND)
-            
-        entries, pagination = custom_pagination(instances, page_number, 10)
-        serailzered_data = self.serializer_class(entries, many=True, context={"user": request.user}).data
+
+        try:
+            entries, pagination = paginate_deals(request, instances, page_number, 10)
+        except ValueError:
+            return self.send_bad_request_response(ResponseMessages.INVALID_CURSOR)
+        serailzered_data = self.serializer_class(entries, many=True, context={
+            "user": request.user,
+            "property_meta": get_property_meta(entries),
+            "wishlisted_ids": get_wishlisted_property_ids(request.user, [entry.id for entry in entries])
+        }).data
         data = {
             "data": serailzered_data,
             "pagination": pagination
@@ -268,146 +299,49 @@ class CommercialDealsView(BaseAPIView):
         )
 
 
-class FilterDealsView(BaseAPIView):
+class FilterDealsView(ReplicaReadMixin, BaseAPIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
     serializer_class = FilterHouseSerializer
     queryset = Property.objects.all()
-    
+
     def get(self, request, *args, **kwargs):
-        key_values = {}
+        """
+        Filter Deals
+        Request URL: /deals/filter/<page>/?property_type=house&city=Islamabad&bedrooms_min=3
+        Header: Authorization: "JWT <token>"
+        Query params (see user_deals.filters for the full list per property type):
+            property_type: house | plot | commercial (required)
+            purpose, category, city, location, marla: repeat a param to match any of its values
+            city, location: exact names (case and spacing insensitive), see /deals/autocomplete/
+            marla_min/marla_max, bedrooms_min/bedrooms_max, bathrooms_min/bathrooms_max: ranges
+            price_from, price_to, series_from, series_to
+            price_min/price_max: deals whose price range overlaps [price_min, price_max]
+            price, price_tolerance: deals with a total price within +/- price_tolerance % (default 10)
+            ordering: created_at | price | marla, prefixed with "-" for descending (default -created_at)
+        """
         page_number = kwargs['page']
-        property_type = request.GET.get('property_type',None)
-        if PropertyType.HOUSE == property_type:
-            category = request.GET.get('category',None)
-            city = request.GET.get('city',None)
-            location = request.GET.get('location',None)
-            house = request.GET.get('house',None)
-            street = request.GET.get('street',None)
-            marla = request.GET.get('marla',None)
-            bedrooms = request.GET.get('bedrooms',None)
-            bathrooms = request.GET.get('bathrooms',None)
-            price_from = request.GET.get('price_from',None)
-            price_to = request.GET.get('price_to',None)
-            purpose = request.GET.get("purpose",None)
-
-
-            if purpose is not None:
-                key_values["property__purpose__icontains"] = purpose
-            if category is not None:
-                key_values["property__category__icontains"]=category 
-            if city is not None:
-                key_values["property__city__icontains"]=city 
-            if location is not None:
-                key_values["property__location__icontains"]=location 
-            if house is not None:
-                key_values["house__icontains"]=house 
-            if street is not None:
-                key_values["street__icontains"]=street
-            if bedrooms is not None:
-                key_values["bedrooms"]= bedrooms
-            if bathrooms is not None:
-                key_values["bathrooms"]= bathrooms
-            if marla is not None:
-                key_values["property__marla"] = marla
-            if price_from is not None:
-                key_values["property__from_price__gte"] = price_from
-            if price_to is not None:
-                key_values["property__to_price__lte"] = price_to
-            key_values["property__property_type"] = PropertyType.HOUSE
-            instances = PropertyHouse.objects.filter(**key_values)
-            instances, pagination = custom_pagination(instances, page_number, 10)
-            serialized_data = FilterHouseSerializer(instances, many=True, context = {"user": request.user}).data
-            payload = {
-                "data":  serialized_data,
-                "pagination": pagination
-            }
-        
-        elif PropertyType.PLOT == property_type:
-            category = request.GET.get('category',None)
-            city = request.GET.get('city',None)
-            location = request.GET.get('location',None)
-            marla = request.GET.get('marla',None)
-            price_from = request.GET.get('price_from',None)
-            price_to = request.GET.get('price_to',None)
-            series_from = request.GET.get('series_from',None)
-            series_to = request.GET.get('series_to',None)
-            purpose = request.GET.get("purpose",None)
-
-            if purpose is not None:
-                key_values["property__purpose__icontains"] = purpose
-            if category is not None:
-                key_values["property__category__icontains"]=category 
-            if city is not None:
-                key_values["property__city__icontains"]=city 
-            if location is not None:
-                key_values["property__location__icontains"]=location 
-            if series_from is not None:
-                key_values["series_from__gte"]= series_from
-            if series_to is not None:
-                key_values["series_to__lte"]= series_to
-            if marla is not None:
-                key_values["property__marla"] = marla
-            if price_from is not None:
-                key_values["property__from_price__gte"] = price_from
-            if price_to is not None:
-                key_values["property__to_price__lte"] = price_to
-            key_values["property__property_type"] = PropertyType.PLOT
-            instances = PropertyPlot.objects.filter(**key_values)
-            instances, pagination = custom_pagination(instances, page_number, 10)
-            serialized_data = FilterPlotSerializer(instances, many=True, context = {"user": request.user}).data
-            payload = {
-                "data":  serialized_data,
-                "pagination": pagination
-            }
-
-        elif PropertyType.COMMERCIAL == property_type:
-            category = request.GET.get('category',None)
-            city = request.GET.get('city',None)
-            location = request.GET.get('location',None)
-            marla = request.GET.get('marla',None)
-            price_from = request.GET.get('price_from',None)
-            price_to = request.GET.get('price_to',None)
-            series_from = request.GET.get('series_from',None)
-            series_to = request.GET.get('series_to',None)
-            bedrooms = request.GET.get('bedrooms',None)
-            bathrooms = request.GET.get('bathrooms',None)
-
-            if category is not None:
-                key_values["property__category__icontains"] = category
-            if city is not None:
-                key_values["property__city__icontains"] = city
-            if location is not None:
-                key_values["property__location__icontains"] = location
-            if series_from is not None:
-                key_values["series_from__gte"] = series_from
-            if series_to is not None:
-                key_values["series_to__lte"] = series_to
-            if bedrooms is not None:
-                key_values["bedrooms"] = bedrooms
-            if bathrooms is not None:
-                key_values["bathrooms"] = bathrooms
-            if marla is not None:
-                key_values["property__marla"] = marla
-            if price_from is not None:
-                key_values["property__from_price__gte"] = price_from
-            if price_to is not None:
-                key_values["property__to_price__lte"] = price_to
-            key_values["property__property_type"] = PropertyType.COMMERCIAL
-            instances = PropertyComercial.objects.filter(**key_values)
-            instances, pagination = custom_pagination(instances, page_number, 10)
-            serialized_data = FilterCommercialSerializer(instances, many=True, context = {"user": request.user}).data
-            payload = {
-                "data":  serialized_data,
-                "pagination": pagination
-            }
-
-        else:
+        filter_set = DEAL_FILTER_SETS.get(request.GET.get('property_type', None))
+        if filter_set is None:
             return self.send_bad_request_response(ResponseMessages.INVALID_CATEGORY)
-        return self.send_success_response(ResponseMessages.SUCCESS,payload= payload)
+        try:
+            instances = filter_set.filter(request.GET)
+        except ValueError:
+            return self.send_bad_request_response(ResponseMessages.INVALID_FILTER)
 
+        entries, pagination = custom_pagination(instances, page_number, 10)
+        serialized_data = filter_set.serializer_class(filter_set.get_subtypes(entries), many=True, context={
+            "user": request.user,
+            "wishlisted_ids": get_wishlisted_property_ids(request.user, [entry.id for entry in entries])
+        }).data
+        payload = {
+            "data": serialized_data,
+            "pagination": pagination
+        }
+        return self.send_success_response(ResponseMessages.SUCCESS, payload=payload)
 
-class WishlistView(BaseAPIView):
+
+class WishlistView(ReplicaReadMixin, BaseAPIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Whishlist.objects.all()
@@ -417,9 +351,11 @@ class WishlistView(BaseAPIView):
         property_id = kwargs.get('property_id', None)
         instance = Property.objects.filter(id=property_id).first()
         if instance:    
-            object, cr = Whishlist.objects.update_or_create(
+            # Revives the row of an earlier removal.
+            object, cr = Whishlist.all_objects.update_or_create(
                 user = request.user,
-                deals = instance
+                deals = instance,
+                defaults = {"is_deleted": False}
             )
             return self.send_success_response(ResponseMessages.SUCCESS)
         else:
@@ -432,7 +368,7 @@ class WishlistView(BaseAPIView):
             self.queryset.filter(
                 user = request.user,
                 deals = instance
-            ).delete()
+            ).soft_delete()
             return self.send_success_response(ResponseMessages.SUCCESS)
         else:
             return self.send_bad_request_response(ResponseMessages.INVALID_PROPERTY_ID)
@@ -443,8 +379,6 @@ class WishlistView(BaseAPIView):
         property_type = self.kwargs.get('property_type', None)
         deal_type = self.kwargs.get('deal_type', PropertyPurpose.REQUIRED)
         search_title = self.kwargs.get('search_title', "default")
-        if not search_title == "default":
-            query_params["deals__title__icontains"] = search_title
 
         if not property_type == "default":
             query_params["deals__property_type"] = property_type
@@ -455,8 +389,17 @@ class WishlistView(BaseAPIView):
         else:
             instances = Property.objects.filter(id__in=request.user.whishlists.filter(**query_params)
                                     .values_list('deals__id', flat=True), purpose=deal_type).order_by('-created_at')
-        entries, pagination = custom_pagination(instances, page_number, 10)
-        serailzered_data = PropertyGenericSerializer(entries, many=True, context={"user": request.user}).data
+        if not search_title == "default":
+            instances = search_properties(instances, search_title)
+        try:
+            entries, pagination = paginate_deals(request, instances, page_number, 10)
+        except ValueError:
+            return self.send_bad_request_response(ResponseMessages.INVALID_CURSOR)
+        serailzered_data = PropertyGenericSerializer(entries, many=True, context={
+            "user": request.user,
+            "property_meta": get_property_meta(entries),
+            "wishlisted_ids": get_wishlisted_property_ids(request.user, [entry.id for entry in entries])
+        }).data
         data = {
             "data": serailzered_data,
             "pagination": pagination
@@ -464,7 +407,7 @@ class WishlistView(BaseAPIView):
         return self.send_success_response(ResponseMessages.SUCCESS, payload=data)
 
 
-class InventoryView(BaseAPIView):
+class InventoryView(ReplicaReadMixin, BaseAPIView):
     """User Inventory"""
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
@@ -478,9 +421,6 @@ class InventoryView(BaseAPIView):
         property_type = self.kwargs.get('property_type', None)
         search_title = self.kwargs.get('search_title', "default")
 
-        if not search_title == "default":
-            query_params["title__icontains"] = search_title
-
         if not property_type == "default":
             query_params["property_type"] = property_type
 
@@ -489,14 +429,101 @@ class InventoryView(BaseAPIView):
             "purpose": deal_type
         })
 
-
-        if not property_type or property_type == "" or property_type == "default":
-            entries, pagination = custom_pagination(self.queryset.filter(**query_params).order_by('-created_at'), page_number, 10)
-        else:
-            entries, pagination= custom_pagination(self.queryset.filter(**query_params).order_by('-created_at'), page_number, 10)
-        serailzered_data = self.serializer_class(entries, many=True, context={"user": request.user}).data
+        instances = self.queryset.filter(**query_params).order_by('-created_at')
+        if not search_title == "default":
+            instances = search_properties(instances, search_title)
+        try:
+            entries, pagination = paginate_deals(request, instances, page_number, 10)
+        except ValueError:
+            return self.send_bad_request_response(ResponseMessages.INVALID_CURSOR)
+        serailzered_data = self.serializer_class(entries, many=True, context={
+            "user": request.user,
+            "property_meta": get_property_meta(entries),
+            "wishlisted_ids": get_wishlisted_property_ids(request.user, [entry.id for entry in entries])
+        }).data
         data = {
             "data": serailzered_data,
             "pagination": pagination
         }
         return self.send_success_response(ResponseMessages.SUCCESS, data)
+
+
+class CityAutocompleteView(BaseAPIView):
+    """City names starting with a prefix"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    queryset = City.objects.all()
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        """
+        Request URL: /deals/autocomplete/cities/?q=isl
+        Header: Authorization: "JWT <token>"
+        Response:
+        {
+            "success": true,
+            "payload": {"data": [{"id": "uuid", "name": "Islamabad"}]},
+            "message": "Success."
+        }
+        """
+        prefix = normalize_place_name(request.GET.get("q", ""))
+        instances = self.queryset.filter(prefix_lookup("normalized_name", prefix)).order_by("normalized_name")
+        data = list(instances.values("id", "name")[:self.limit])
+        return self.send_success_response(ResponseMessages.SUCCESS, payload={"data": data})
+
+
+class LocationAutocompleteView(BaseAPIView):
+    """Location names within a city starting with a prefix"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    queryset = Location.objects.all()
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        """
+        Request URL: /deals/autocomplete/locations/?city=Islamabad&q=fai
+        Header: Authorization: "JWT <token>"
+        Response:
+        {
+            "success": true,
+            "payload": {"data": [{"id": "uuid", "name": "Faisal town"}]},
+            "message": "Success."
+        }
+        """
+        city = normalize_place_name(request.GET.get("city", ""))
+        if not city:
+            return self.send_bad_request_response(ResponseMessages.CITY_MISSING)
+        prefix = normalize_place_name(request.GET.get("q", ""))
+        instances = self.queryset.filter(
+            prefix_lookup("normalized_name", prefix), city__normalized_name=city
+        ).order_by("normalized_name")
+        data = list(instances.values("id", "name")[:self.limit])
+        return self.send_success_response(ResponseMessages.SUCCESS, payload={"data": data})
+
+
+class AsyncPublicDealsView(AsyncBaseAPIView, PublicDealsView):
+    """PublicDealsView for ASGI, see baselayer/asyncviews.py"""
+
+    async def get(self, request, *args, **kwargs):
+        return await database_sync_to_async(super().get)(request, *args, **kwargs)
+
+
+class AsyncFilterDealsView(AsyncBaseAPIView, FilterDealsView):
+    """FilterDealsView for ASGI, see baselayer/asyncviews.py"""
+
+    async def get(self, request, *args, **kwargs):
+        return await database_sync_to_async(super().get)(request, *args, **kwargs)
+
+
+class AsyncWishlistView(AsyncBaseAPIView, WishlistView):
+    """WishlistView for ASGI, see baselayer/asyncviews.py"""
+
+    async def get(self, request, *args, **kwargs):
+        return await database_sync_to_async(super().get)(request, *args, **kwargs)
+
+
+class AsyncInventoryView(AsyncBaseAPIView, InventoryView):
+    """InventoryView for ASGI, see baselayer/asyncviews.py"""
+
+    async def get(self, request, *args, **kwargs):
+        return await database_sync_to_async(super().get)(request, *args, **kwargs)
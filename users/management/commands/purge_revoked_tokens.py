@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete the revoked token ids whose tokens have expired, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted per query.")
+        parser.add_argument("--pause", type=float, default=0.1, help="Seconds between batches.")
+
+    def handle(self, *args, **options):
+        queryset = RevokedToken.all_objects.filter(expires_at__lte=timezone.now())
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list("pk", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            RevokedToken.all_objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired revoked tokens."))
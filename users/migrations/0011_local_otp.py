@@ -0,0 +1,37 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:19
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_user_fcm_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OTPCode',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('destination', models.CharField(max_length=254)),
+                ('purpose', models.CharField(max_length=50)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('expires_at', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('consumed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='tempuseremail',
+            name='otp',
+        ),
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(fields=['destination', 'purpose', 'created_at'], name='otp_code_lookup_idx'),
+        ),
+    ]
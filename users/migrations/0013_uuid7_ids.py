@@ -0,0 +1,51 @@
+# Generated by Django 3.2.7 on 2026-10-18 13:40
+
+import baselayer.basemodels
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_revoked_tokens'),
+    ]
+
+    # Ids are generated in Python and the primary key index is unchanged
+    # (db_index was redundant on it), so existing rows keep their ids and no
+    # table is rebuilt.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='otpcode',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='phonenumberotp',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='revokedtoken',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='tempuseremail',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='id',
+                    field=models.UUIDField(default=baselayer.basemodels.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from baselayer.basemodels import LogsMixin
-from django.contrib.auth.models import AbstractUser
-from baselayer.baseauthentication import generate_access_token
+from django.contrib.auth.models import AbstractUser, UserManager
+from baselayer.baseauthentication import generate_access_token, generate_refresh_token, user_cache
 
 #Choice classes
 class PhoneNumberOTPTypeChoices(models.TextChoices):
@@ -21,6 +21,8 @@ class User(LogsMixin, AbstractUser):
     fullname = models.CharField(("full name"), max_length=50, blank=True, null=True)
     is_active = models.BooleanField(("is_active"), default=False)
     fcm_token = models.TextField(blank=True, null=True)
+    # Embedded in tokens, bumped to invalidate all of them at once.
+    token_version = models.PositiveIntegerField(default=0)
     # token = models.TextField(_('token'), unique=True)
     USERNAME_FIELD = "phone_number"
     REQUIRED_FIELDS = ["email", "password"]
@@ -29,9 +31,27 @@ class User(LogsMixin, AbstractUser):
     first_name = None
     last_name = None
 
+    # Django's manager (create_user, natural key lookups) over LogsMixin's.
+    objects = UserManager()
+
     def get_access_token(self):
         return generate_access_token(self)
 
+    def get_refresh_token(self):
+        return generate_refresh_token(self)
+
+    def get_tokens(self):
+        """Access and refresh token pair for login responses"""
+        return {"token": self.get_access_token(), "refresh_token": self.get_refresh_token()}
+
+    def invalidate_tokens(self):
+        """Make every token issued to this user so far fail authentication.
+        Tokens generated afterwards carry the new version.
+        """
+        User.objects.filter(pk=self.pk).update(token_version=models.F("token_version") + 1)
+        self.refresh_from_db(fields=["token_version"])
+        user_cache.invalidate(self.pk)
+
 
 class UserProfile(LogsMixin):
     city = models.CharField(max_length=50, blank=True, null=True)
@@ -51,8 +71,29 @@ class PhoneNumberOTP(LogsMixin):
     )
 
 class TempUserEmail(LogsMixin):
+    # The code itself is kept (hashed) by the local OTP engine, see users/otp.py
     email = models.EmailField(("email address"), blank=True, null=True)
-    otp = models.CharField(("otp"), max_length=6)
     user = models.ForeignKey(
         User, related_name="temp_user_email", on_delete=models.CASCADE
     )
+
+
+class OTPCode(LogsMixin):
+    """Hashed one time code issued by users.otp.LocalOTPBackend."""
+    destination = models.CharField(max_length=254)
+    purpose = models.CharField(max_length=50)
+    code_hash = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    consumed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["destination", "purpose", "created_at"], name="otp_code_lookup_idx"),
+        ]
+
+
+class RevokedToken(LogsMixin):
+    """Token ids revoked before their expiry, see baselayer/tokenrevocation.py."""
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
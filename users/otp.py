@@ -0,0 +1,166 @@
+"""OTP backends and code senders.
+
+OTP_BACKEND selects how phone number OTPs are issued and checked:
+
+- ``TwilioVerifyOTPBackend`` sends and checks codes through Twilio Verify.
+- ``LocalOTPBackend`` generates the code itself, keeps only an HMAC of it in
+  OTPCode, expires it after OTP_TTL_SECONDS, limits sends per destination
+  and wrong attempts per code, and delivers it through the sender configured
+  in OTP_SENDERS for the channel.
+
+Email OTPs always use the local engine.
+"""
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from users.models import OTPCode
+from utils import twilio_client
+from utils.reuseable import generate_six_length_random_number
+
+logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
+
+SMS = "sms"
+EMAIL = "email"
+
+
+class OTPRateLimitExceeded(Exception):
+    """Too many codes were sent to a destination in OTP_SEND_WINDOW_SECONDS."""
+
+
+# Senders
+class ConsoleSender:
+    """Logs the code instead of delivering it; for development and load tests."""
+
+    def send(self, destination, message):
+        logger.info(f"OTP for {destination}: {message}")
+
+
+class FileSender:
+    """Appends codes to OTP_FILE_PATH so tests can read them back."""
+
+    def send(self, destination, message):
+        with open(settings.OTP_FILE_PATH, "a") as otp_file:
+            otp_file.write(f"{timezone.now().isoformat()}\t{destination}\t{message}\n")
+
+
+class EmailSender:
+    def send(self, destination, message):
+        send_mail("GEMNINE TECH OTP: ", message, settings.DEFAULT_FROM_EMAIL, [destination])
+
+
+class TwilioSMSSender:
+    def send(self, destination, message):
+        twilio_client.get_twilio_client().messages.create(
+            to=destination, from_=settings.TWILIO_SMS_FROM, body=message
+        )
+
+
+def get_sender(channel):
+    return import_string(settings.OTP_SENDERS[channel])()
+
+
+# Backends
+class OTPBackend:
+    def send(self, destination, purpose, channel=SMS):
+        """Send a new code to the destination.
+        :return reference to pass back to verify
+        :raise OTPRateLimitExceeded
+        """
+        raise NotImplementedError
+
+    def verify(self, destination, purpose, code, reference=None):
+        """:return True when the code is valid for the destination and purpose"""
+        raise NotImplementedError
+
+
+class TwilioVerifyOTPBackend(OTPBackend):
+    """Codes are generated, delivered and checked by Twilio Verify."""
+
+    def send(self, destination, purpose, channel=SMS):
+        return twilio_client.send_phone_number_verification_sms(destination)
+
+    def verify(self, destination, purpose, code, reference=None):
+        verification_check = twilio_client.verify_phone_number_with_otp(reference, destination, code)
+        return verification_check.status == "approved"
+
+
+class LocalOTPBackend(OTPBackend):
+    """Codes are generated here and stored hashed in OTPCode."""
+
+    def hash_code(self, destination, purpose, code):
+        message = f"{purpose}:{destination}:{code}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def send(self, destination, purpose, channel=SMS):
+        """Must run in autocommit mode: the new code is committed before the
+        codes in the window are counted, so concurrent sends all see each
+        other and never get past the limit together.
+        """
+        now = timezone.now()
+        code = generate_six_length_random_number()
+        otp_code = OTPCode.objects.create(
+            destination=destination,
+            purpose=purpose,
+            code_hash=self.hash_code(destination, purpose, code),
+            expires_at=now + timedelta(seconds=settings.OTP_TTL_SECONDS),
+        )
+        window_start = now - timedelta(seconds=settings.OTP_SEND_WINDOW_SECONDS)
+        sent_count = OTPCode.objects.filter(
+            destination=destination, purpose=purpose, created_at__gte=window_start
+        ).count()
+        if sent_count > settings.OTP_SEND_LIMIT:
+            otp_code.delete()
+            raise OTPRateLimitExceeded(f"{sent_count - 1} OTPs sent to {destination} for {purpose}")
+
+        get_sender(channel).send(destination, code)
+        return str(otp_code.id)
+
+    def verify(self, destination, purpose, code, reference=None):
+        # Only the latest code is valid; sending a new one replaces it.
+        otp_code = (
+            OTPCode.objects.filter(destination=destination, purpose=purpose)
+            .order_by("-created_at")
+            .first()
+        )
+        if otp_code is None:
+            return False
+        now = timezone.now()
+        # Every check, right or wrong, reserves an attempt first, so concurrent
+        # guesses can't get past OTP_MAX_ATTEMPTS.
+        reserved = OTPCode.objects.filter(
+            id=otp_code.id,
+            consumed_at__isnull=True,
+            expires_at__gt=now,
+            attempts__lt=settings.OTP_MAX_ATTEMPTS,
+        ).update(attempts=F("attempts") + 1)
+        if not reserved:
+            return False
+        if not hmac.compare_digest(otp_code.code_hash, self.hash_code(destination, purpose, str(code))):
+            return False
+        # Conditional update so a code is consumed only once under concurrency.
+        return bool(
+            OTPCode.objects.filter(id=otp_code.id, consumed_at__isnull=True).update(consumed_at=now)
+        )
+
+
+_backends = {}
+
+
+def get_otp_backend(path=None):
+    """Backend instance for the dotted path, OTP_BACKEND by default."""
+    path = path or settings.OTP_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def get_email_otp_backend():
+    return get_otp_backend("users.otp.LocalOTPBackend")
@@ -0,0 +1,61 @@
+"""Password checks for the login path.
+
+The hash is computed in a small process-wide thread pool so a burst of
+logins can't occupy more than PASSWORD_HASHER_WORKERS threads with PBKDF2,
+whatever the server (WSGI threads or ASGI) runs the view on. Rehashing
+upgraded passwords is left to the calling thread, which owns the database
+connection.
+
+``check_login_password`` blocks its caller until the hash is done, so a sync
+view still holds a worker thread meanwhile; async views (AsyncSignInView)
+await ``check_login_password_async`` and free the event loop instead.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from baselayer.asyncviews import database_sync_to_async
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHER_WORKERS, thread_name_prefix="password-hasher")
+
+
+def verify_password(raw_password, encoded):
+    """:return (is_correct, must_update)"""
+    must_update = []
+    is_correct = check_password(raw_password, encoded, setter=must_update.append)
+    return is_correct, bool(must_update)
+
+
+def check_login_password(user, raw_password):
+    """Check a login password the way ModelBackend.authenticate does.
+    :param user: the user with that phone number, or None
+    :return True when the user exists, is active and the password matches
+    """
+    if user is None:
+        # Hash anyway so unknown numbers take as long as wrong passwords.
+        _executor.submit(make_password, raw_password).result()
+        return False
+    is_correct, must_update = _executor.submit(verify_password, raw_password, user.password).result()
+    if is_correct and must_update:
+        rehash_password(user, raw_password)
+    return is_correct and user.is_active
+
+
+async def check_login_password_async(user, raw_password):
+    """check_login_password for async views, awaiting the hash on the event loop."""
+    if user is None:
+        await asyncio.wrap_future(_executor.submit(make_password, raw_password))
+        return False
+    is_correct, must_update = await asyncio.wrap_future(
+        _executor.submit(verify_password, raw_password, user.password)
+    )
+    if is_correct and must_update:
+        await database_sync_to_async(rehash_password)(user, raw_password)
+    return is_correct and user.is_active
+
+
+def rehash_password(user, raw_password):
+    user.set_password(raw_password)
+    user.save(update_fields=["password"])
@@ -12,7 +12,9 @@ from users.models import (
     User,
     UserProfile,
 )
-from utils import twilio_client
+from users.otp import get_otp_backend
+from users.passwords import check_login_password
+from utils.provider_guard import ProviderUnavailable
 
 logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
 
@@ -26,6 +28,7 @@ class LoginSerializer(serializers.Serializer):
         write_only=True,
     )
     fcm_token = serializers.CharField(label=("fcm_token"), write_only=True)
+    check_password = True
 
     def validate(self, attrs):
 
@@ -44,9 +47,21 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 ResponseMessages.INVALID_PHONE_NUMBER.value
             )
+        # User and profile in one query; None when the number or password is wrong.
+        user = User.objects.select_related("userprofile").filter(phone_number=attrs["phone_number"]).first()
+        if self.check_password and not check_login_password(user, attrs["password"]):
+            user = None
+        attrs["user"] = user
         return attrs
 
 
+class AsyncLoginSerializer(LoginSerializer):
+    """LoginSerializer whose user is only looked up by phone number; the
+    caller checks the password with check_login_password_async.
+    """
+    check_password = False
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     token = serializers.ReadOnlyField(source="get_access_token")
     city = serializers.CharField(write_only=True)
@@ -179,14 +194,14 @@ class VerifyOTPSerializer(serializers.ModelSerializer):
                 ).first()
             if instance is None:
                 raise serializers.ValidationError(ResponseMessages.INVALID_OTP_OR_EXPIRED.value)
-            verification_check = twilio_client.verify_phone_number_with_otp(instance.twilio_service_id,
-                                                                            attrs["phone_number"],
-                                                                            attrs["otp"])
-            if not "approved" == verification_check.status:
+            if not get_otp_backend().verify(attrs["phone_number"], attrs["otp_type"], str(attrs["otp"]),
+                                            reference=instance.twilio_service_id):
                 logger.error("OTP invalid or expired")
                 raise serializers.ValidationError(
                     ResponseMessages.INVALID_OTP_OR_EXPIRED.value
                 )
+        except ProviderUnavailable:
+            raise
         except TwilioRestException as err:
             logger.error(f" twilio exceptions: {err}")
             raise serializers.ValidationError(
@@ -1,3 +1,458 @@
-from django.test import TestCase
+import io
+import smtplib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from twilio.base.exceptions import TwilioRestException
+
+from baselayer.baseauthentication import user_cache
+from baselayer.tokenrevocation import RevocationList
+from users.models import (
+    OTPCode, PhoneNumberOTP, PhoneNumberOTPTypeChoices, RevokedToken, TempUserEmail, User, UserProfile,
+)
+from users import passwords
+from users.otp import LocalOTPBackend, OTPRateLimitExceeded
+from utils import reuseable, twilio_client
+from utils.http_transport import get_session
+from utils.mock_responses import ResponseMessages
+from utils.provider_guard import CLOSED, OPEN, CircuitOpen, get_circuit_breaker, reset_circuit_breakers
+
+SERVICE_SID = "VAfaketwilio"
+APPROVED_CODE = "123456"
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """Answers the Twilio Verify calls made by utils/twilio_client.py."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        server.requests.append((self.path, body))
+        server.client_ports.add(self.client_address[1])
+        time.sleep(server.delay)
+        if server.status_code >= 500:
+            return self.send_json(server.status_code, {"code": 20500, "message": "fake outage", "status": 500})
+        if self.path == "/v2/Services":
+            sid, name = f"VAcreated{len(server.services)}", parse_qs(body)["FriendlyName"][0]
+            server.services[sid] = name
+            return self.send_json(201, {"sid": sid, "friendly_name": name})
+        if self.path.split("/")[3] not in server.services:
+            return self.send_json(404, {"code": 20404, "message": "not found", "status": 404})
+        if self.path.endswith("/Verifications"):
+            return self.send_json(201, {"sid": "VEfake", "service_sid": SERVICE_SID, "status": "pending"})
+        if self.path.endswith("/VerificationCheck"):
+            approved = f"Code={APPROVED_CODE}" in body
+            return self.send_json(200, {"sid": "VEfake", "status": "approved" if approved else "pending"})
+        return self.send_json(404, {"code": 20404, "message": "not found", "status": 404})
+
+    def do_GET(self):
+        self.server.requests.append((self.path, ""))
+        if self.path.startswith("/v2/Services?"):
+            services = [{"sid": sid, "friendly_name": name} for sid, name in self.server.services.items()]
+            return self.send_json(200, {"services": services, "meta": {"key": "services", "next_page_url": None}})
+        return self.send_json(404, {"code": 20404, "message": "not found", "status": 404})
+
+    def send_json(self, status_code, payload):
+        content = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(OTP_BACKEND="users.otp.TwilioVerifyOTPBackend")
+class TwilioProviderGuardTests(TestCase):
+    """OTP views against a local fake Twilio server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwilioHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.patches = [
+            mock.patch.object(twilio_client, "TWILIO_API_BASE_URL", f"http://127.0.0.1:{cls.server.server_port}"),
+            mock.patch.object(twilio_client, "TWILIO_VERIFY_SERVICE_SID", SERVICE_SID),
+            mock.patch.object(twilio_client, "TWILIO_ACCOUNT_SID", "ACfaketwilio"),
+            mock.patch.object(twilio_client, "TWILIO_AUTH_TOKEN", "fake-token"),
+        ]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patch in cls.patches:
+            patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.client_ports = set()
+        self.server.services = {"VAother": "Other", SERVICE_SID: twilio_client.COMPANY_NAME}
+        self.server.delay = 0
+        self.server.status_code = 200
+        reset_circuit_breakers()
+        # Built against the fake server and credentials of this class only.
+        twilio_client._client = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        twilio_client._client = None
+        twilio_client._verify_service_sid = None
+
+    def register(self, phone_number="+923001234567"):
+        return self.client.post("/users/registration/", {
+            "phone_number": phone_number,
+            "password": "secret-password",
+            "fullname": "Test User",
+            "email": "test@example.com",
+            "city": "Lahore",
+        }, format="json")
+
+    def test_signup_otp_round_trip(self):
+        response = self.register()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.server.requests[0][0], f"/v2/Services/{SERVICE_SID}/Verifications")
+        otp = PhoneNumberOTP.objects.get(user__phone_number="+923001234567")
+        self.assertEqual(otp.twilio_service_id, SERVICE_SID)
+
+        response = self.client.patch("/users/verify-otp/", {
+            "phone_number": "+923001234567", "otp": APPROVED_CODE, "otp_type": PhoneNumberOTPTypeChoices.signup_otp,
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.server.requests[-1][0], f"/v2/Services/{SERVICE_SID}/VerificationCheck")
+
+    def test_calls_reuse_the_pooled_connection(self):
+        client = twilio_client.get_twilio_client()
+        self.assertIs(client.http_client.session, get_session("twilio"))
+        threads = [
+            threading.Thread(target=twilio_client.send_phone_number_verification_sms, args=("+923001234567",))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        twilio_client.verify_phone_number_with_otp(SERVICE_SID, "+923001234567", APPROVED_CODE)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_verify_service_is_looked_up_once(self):
+        with mock.patch.object(twilio_client, "TWILIO_VERIFY_SERVICE_SID", ""):
+            for _ in range(2):
+                self.assertEqual(twilio_client.send_phone_number_verification_sms("+923001234567"), SERVICE_SID)
+            self.assertEqual([path.split("?")[0] for path, _ in self.server.requests], [
+                "/v2/Services",
+                f"/v2/Services/{SERVICE_SID}/Verifications",
+                f"/v2/Services/{SERVICE_SID}/Verifications",
+            ])
+
+            # Deleted on twilio: found missing on the next send, then created again.
+            del self.server.services[SERVICE_SID]
+            self.server.requests = []
+            self.assertEqual(twilio_client.send_phone_number_verification_sms("+923001234567"), "VAcreated1")
+            self.assertEqual(twilio_client.send_phone_number_verification_sms("+923001234567"), "VAcreated1")
+            self.assertEqual([path.split("?")[0] for path, _ in self.server.requests], [
+                f"/v2/Services/{SERVICE_SID}/Verifications", "/v2/Services", "/v2/Services",
+                "/v2/Services/VAcreated1/Verifications", "/v2/Services/VAcreated1/Verifications",
+            ])
+
+    def test_slow_twilio_is_cut_at_the_deadline(self):
+        self.server.delay = 2
+        with mock.patch.object(twilio_client, "TWILIO_CALL_DEADLINE_SECONDS", 0.3):
+            started_at = time.monotonic()
+            response = self.register()
+        self.assertLess(time.monotonic() - started_at, 1.5)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @override_settings(PROVIDER_CIRCUIT_BREAKERS={
+        "twilio": {"failure_rate": 0.5, "minimum_calls": 2, "window_seconds": 30, "open_seconds": 0.2},
+    })
+    def test_circuit_opens_fails_fast_and_closes_after_probe(self):
+        breaker = get_circuit_breaker("twilio")
+        self.server.status_code = 500
+        for _ in range(2):
+            with self.assertRaises(TwilioRestException):
+                twilio_client.send_phone_number_verification_sms("+923001234567")
+        self.assertEqual(breaker.state, OPEN)
+
+        with self.assertRaises(CircuitOpen):
+            twilio_client.send_phone_number_verification_sms("+923001234567")
+        self.assertEqual(len(self.server.requests), 2)
+        User.objects.create(phone_number="+923001234567")
+        response = self.client.post("/users/forget-password/", {"phone_number": "+923001234567"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        time.sleep(0.25)
+        self.server.status_code = 200
+        self.assertEqual(twilio_client.send_phone_number_verification_sms("+923001234567"), SERVICE_SID)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(len(self.server.requests), 3)
+
+
+class TokenVersionTests(TestCase):
+    """A password change logs out every session of the user."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User(phone_number="+923001234567", is_active=True)
+        self.user.set_password("old-password")
+        self.user.save()
+        UserProfile.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def get_profile(self, token):
+        return self.client.get("/users/profile/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def refresh(self, refresh_token):
+        return self.client.post("/users/refresh-token/", {"refresh_token": refresh_token}, format="json")
+
+    def assertRejected(self, response):
+        # 403 from DRF for a failed authentication without a WWW-Authenticate header.
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertFalse(response.json()["success"])
+
+    def test_password_change_invalidates_other_sessions(self):
+        this_device = self.user.get_tokens()
+        other_device = self.user.get_tokens()
+        self.assertEqual(self.get_profile(other_device["token"]).status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(
+            "/users/change-password/",
+            {"old_password": "old-password", "new_password": "new-password", "confirm_password": "new-password"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {this_device['token']}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_tokens = response.json()["payload"]
+
+        for tokens in (this_device, other_device):
+            self.assertRejected(self.get_profile(tokens["token"]))
+            self.assertRejected(self.refresh(tokens["refresh_token"]))
+        self.assertEqual(self.get_profile(new_tokens["token"]).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(new_tokens["refresh_token"]).status_code, status.HTTP_200_OK)
+
+    def test_cached_user_is_checked_against_the_new_version(self):
+        tokens = self.user.get_tokens()
+        # Loads the user into the cache.
+        self.assertEqual(self.get_profile(tokens["token"]).status_code, status.HTTP_200_OK)
+        self.user.invalidate_tokens()
+        self.assertRejected(self.get_profile(tokens["token"]))
+
+
+@override_settings(
+    OTP_SENDERS={"sms": "users.otp.ConsoleSender"}, OTP_MAX_ATTEMPTS=3, OTP_SEND_LIMIT=2,
+)
+class LocalOTPBackendTests(TestCase):
+    destination = "+923001234567"
+    purpose = "signup_otp"
+
+    def setUp(self):
+        self.backend = LocalOTPBackend()
+
+    def send(self, code=APPROVED_CODE):
+        with mock.patch("users.otp.generate_six_length_random_number", return_value=code):
+            return self.backend.send(self.destination, self.purpose)
+
+    def verify(self, code):
+        return self.backend.verify(self.destination, self.purpose, code)
+
+    def test_code_is_consumed_once(self):
+        self.send()
+        self.assertTrue(self.verify(APPROVED_CODE))
+        self.assertFalse(self.verify(APPROVED_CODE))
+
+    def test_attempts_are_reserved_before_the_check(self):
+        self.send()
+        self.assertFalse(self.verify("000000"))
+        now = timezone.now
+
+        def concurrent_guesses():
+            # Two wrong guesses land between reading the code and checking it.
+            OTPCode.objects.update(attempts=F("attempts") + 2)
+            return now()
+
+        with mock.patch.object(timezone, "now", side_effect=concurrent_guesses):
+            self.assertFalse(self.verify(APPROVED_CODE))
+        self.assertEqual(OTPCode.objects.get().attempts, 3)
+
+    def test_send_limit(self):
+        self.send()
+        self.send()
+        with self.assertRaises(OTPRateLimitExceeded):
+            self.send()
+        # The rejected code is not kept and the latest sent one still works.
+        self.assertEqual(OTPCode.objects.count(), 2)
+        self.assertTrue(self.verify(APPROVED_CODE))
+
+
+class RevocationListTests(TestCase):
+
+    def setUp(self):
+        self.revocation_list = RevocationList(1 << 10, 3, sync_seconds=30)
+
+    def revoke(self, jti, expires_in):
+        self.revocation_list.revoke({"jti": jti, "exp": time.time() + expires_in})
+
+    def test_stale_filter_is_rebuilt_by_one_thread(self):
+        self.revoke("revoked", 60)
+        old_bloom = self.revocation_list.get_bloom()
+        self.revocation_list.synced_at = 0
+        # Another thread is rebuilding: the old filter is used without waiting.
+        with self.revocation_list.sync_lock, self.assertNumQueries(0):
+            self.assertIs(self.revocation_list.get_bloom(), old_bloom)
+        with self.assertNumQueries(1):
+            self.assertIsNot(self.revocation_list.get_bloom(), old_bloom)
+        self.assertTrue(self.revocation_list.is_revoked("revoked"))
+
+    def test_purge_expired_revocations(self):
+        self.revoke("expired", -60)
+        self.revoke("revoked", 60)
+        call_command("purge_revoked_tokens", pause=0, stdout=io.StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["revoked"])
+
+
+class SignInTests(TestCase):
+
+    def setUp(self):
+        self.user = User(phone_number="+923001234567", fcm_token="device-token", is_active=True)
+        self.user.set_password("password")
+        self.user.save()
+        UserProfile.objects.create(user=self.user, city="Lahore")
+        self.client = APIClient()
+
+    def sign_in(self, phone_number="+923001234567", password="password", fcm_token="device-token"):
+        data = {"phone_number": phone_number, "password": password, "fcm_token": fcm_token}
+        return self.client.post("/users/sign-in/", data, format="json")
+
+    def test_sign_in_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.sign_in()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["payload"]["city"], "Lahore")
+
+    def test_new_fcm_token_is_saved(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.sign_in(fcm_token="new-device").status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.fcm_token, "new-device")
+
+    def test_unknown_number_still_hashes(self):
+        with mock.patch.object(passwords, "make_password", wraps=make_password) as hash_password:
+            response = self.sign_in(phone_number="+923007654321")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        hash_password.assert_called_once_with("password")
+
+    def test_wrong_password(self):
+        self.assertEqual(self.sign_in(password="wrong").status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AsyncSignInTests(TransactionTestCase):
+    """Async sign-in end to end; its database work runs on other threads."""
+
+    def setUp(self):
+        # The pool threads close their connections after each call, or the
+        # test database could not be dropped at the end of the run.
+        patcher = mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User(phone_number="+923001234567", fcm_token="device-token", is_active=True)
+        self.user.set_password("password")
+        self.user.save()
+        UserProfile.objects.create(user=self.user, city="Lahore")
+        self.client = AsyncClient()
+
+    async def sign_in(self, phone_number="+923001234567", password="password"):
+        data = {"phone_number": phone_number, "password": password, "fcm_token": "device-token"}
+        return await self.client.post("/users/async/sign-in/", data, content_type="application/json")
+
+    async def test_sign_in_awaits_the_hash(self):
+        with mock.patch("users.serializers.check_login_password") as blocking_check:
+            response = await self.sign_in()
+            self.assertEqual((await self.sign_in(password="wrong")).status_code, status.HTTP_401_UNAUTHORIZED)
+            with mock.patch.object(passwords, "make_password", wraps=make_password) as hash_password:
+                response_unknown = await self.sign_in(phone_number="+923007654321")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["payload"]["phone_number"], "+923001234567")
+        self.assertEqual(response_unknown.status_code, status.HTTP_401_UNAUTHORIZED)
+        hash_password.assert_called_once_with("password")
+        blocking_check.assert_not_called()
+
+
+class ProviderSessionTests(TestCase):
+
+    # Only the session handling is under test, not pyfcm itself.
+    @mock.patch.object(reuseable, "FCMNotification", side_effect=lambda api_key: mock.Mock(
+        request_headers=mock.Mock(return_value={"Authorization": f"key={api_key}"}),
+    ))
+    def test_push_services_share_the_fcm_session(self, fcm_notification):
+        push_services = []
+
+        def get_push_service():
+            push_services.append(reuseable.get_push_service())
+            push_services.append(reuseable.get_push_service())
+
+        threads = [threading.Thread(target=get_push_service) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        # One pyfcm instance per thread, all sending through one session.
+        self.assertIs(push_services[0], push_services[1])
+        self.assertIsNot(push_services[0], push_services[2])
+        session = get_session("fcm")
+        self.addCleanup(session.headers.pop, "Authorization", None)
+        self.assertTrue(all(push_service.requests_session is session for push_service in push_services))
+        self.assertEqual(session.timeout, (3.05, 20))
+        self.assertEqual(fcm_notification.call_count, 2)
+
+    def test_one_session_per_provider(self):
+        twilio_session = get_session("twilio")
+        self.assertIs(twilio_client.PooledTwilioHttpClient().session, twilio_session)
+        self.assertIsNot(twilio_session, get_session("fcm"))
+        self.assertEqual(twilio_session.timeout, (3.05, 10))
+
+
+@override_settings(OTP_SENDERS={"email": "users.otp.EmailSender"})
+class EmailChangeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(phone_number="+923001234567", email="old@example.com")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_access_token()}")
+
+    def change_email(self, email):
+        return self.client.patch("/users/change-email/", {"email": email}, format="json")
+
+    def test_otp_is_sent(self):
+        response = self.change_email("new@example.com")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+        self.assertEqual(TempUserEmail.objects.get(user=self.user).email, "new@example.com")
+
+    def test_failed_send_is_reported(self):
+        TempUserEmail.objects.create(user=self.user, email="pending@example.com")
+        with mock.patch("users.otp.send_mail", side_effect=smtplib.SMTPException("connection refused")):
+            with self.assertLogs(f"{settings.LOGGER_NAME_PREFIX}users.views", "ERROR"):
+                response = self.change_email("new@example.com")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()["message"], ResponseMessages.OTP_SERVICE_UNAVAILABLE)
+        self.assertEqual(TempUserEmail.objects.get(user=self.user).email, "pending@example.com")
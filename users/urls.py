@@ -1,6 +1,7 @@
 from django.urls import path
 from users.views import (RegistrationView,
                          SignInView,
+                         AsyncSignInView,
                          ForgetPasswordAPIView,
                          VerifyOTPAPIView,
                          ResetPasswordAPIView,
@@ -9,11 +10,15 @@ from users.views import (RegistrationView,
                          PhoneNumberView,
                          PasswordAPIView,
                          VerifyEmailOTPView,
+                         ProviderStatusView,
+                         RefreshTokenView,
                          )
 
 urlpatterns = [
     path("registration/", RegistrationView.as_view(), name="register-new-user"),
     path("sign-in/", SignInView.as_view(), name="sign-in-user"),
+    path("async/sign-in/", AsyncSignInView.as_view(), name="async-sign-in-user"),
+    path("refresh-token/", RefreshTokenView.as_view(), name="refresh-token"),
     #Forgot Password
     path("forget-password/", ForgetPasswordAPIView.as_view(), name="forget-password"),
     path("reset-password/", ResetPasswordAPIView.as_view(), name="reset-password"),
@@ -25,4 +30,6 @@ urlpatterns = [
     path("verify-email-otp/", VerifyEmailOTPView.as_view(), name ="verify-email-otp"),
     path("change-phone-number/", PhoneNumberView.as_view(), name ="update_number"),
     path("change-password/", PasswordAPIView.as_view(), name="update-password"),
+    #Instrumentation
+    path("provider-status/", ProviderStatusView.as_view(), name="provider-status"),
 ]
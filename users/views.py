@@ -1,16 +1,21 @@
 from email.policy import default
 import logging
-from django.core.mail import send_mail
-from django.contrib.auth import authenticate
 from rest_framework import status
-from utils.reuseable import generate_six_length_random_number
-from gemnineDealerBackend.settings import (EMAIL_HOST_USER, EMAIL_HOST_PASSWORD,EMAIL_HOST,EMAIL_PORT)
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import (AllowAny,
+                                        IsAdminUser,
                                         IsAuthenticated,
                                         )
 
+from baselayer.asyncviews import AsyncBaseAPIView, database_sync_to_async
 from baselayer.baseapiviews import BaseAPIView
-from baselayer.baseauthentication import JWTAuthentication
+from baselayer.baseauthentication import (
+    REFRESH_TOKEN,
+    JWTAuthentication,
+    decode_token,
+    get_token_user,
+    revoke_token,
+)
 from utils.mock_responses import ResponseMessages
 from gemnineDealerBackend import settings
 from users.models import (
@@ -20,6 +25,7 @@ from users.models import (
     User,
 )
 from users.serializers import (
+    AsyncLoginSerializer,
     ForgetPasswordSerializer,
     LoginSerializer,
     RegistrationSerializer,
@@ -32,10 +38,36 @@ from users.serializers import (
 from utils.baseutils import (
     get_first_error_message_from_serializer_errors,
 )
-from utils.twilio_client import send_phone_number_verification_sms
+from utils.http_transport import get_all_provider_metrics
+from utils.provider_guard import ProviderUnavailable
+from users.otp import EMAIL, OTPRateLimitExceeded, get_email_otp_backend, get_otp_backend
+from users.passwords import check_login_password_async
 
 logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
 
+EMAIL_CHANGE_OTP = "change_email_otp"
+
+
+def revoke_request_tokens(request):
+    """Invalidate every token of the request's user, e.g. after a password
+    or email change. The access token of the request, and the refresh token
+    in its body when it belongs to the same user, are also revoked outright,
+    since other processes may check versions against a cached user for up
+    to AUTH_USER_CACHE_TTL.
+    """
+    request.user.invalidate_tokens()
+    revoke_token(request.auth)
+    refresh_token = request.data.get("refresh_token")
+    if not refresh_token:
+        return
+    try:
+        payload = decode_token(refresh_token, REFRESH_TOKEN)
+    except APIException as err:
+        logger.info(f"refresh token not revoked: {err}")
+        return
+    if payload["user_id"] == request.auth["user_id"]:
+        revoke_token(payload)
+
 
 class RegistrationView(BaseAPIView):
     """User registration APIView"""
@@ -78,10 +110,16 @@ class RegistrationView(BaseAPIView):
         user = serializer_registration.save()
         try:
             phone_number = request.data.get("phone_number")
-            service_id = send_phone_number_verification_sms(phone_number)
+            service_id = get_otp_backend().send(phone_number, PhoneNumberOTPTypeChoices.signup_otp)
             user = User.objects.get(phone_number = phone_number)
             PhoneNumberOTP.objects.update_or_create(user = user, otp_type=PhoneNumberOTPTypeChoices.signup_otp,
-                                                    defaults = {'twilio_service_id': service_id.sid})
+                                                    defaults = {'twilio_service_id': service_id})
+        except OTPRateLimitExceeded as e:
+            logger.warning(e)
+            return self.send_bad_request_response(message=ResponseMessages.OTP_RATE_LIMITED)
+        except ProviderUnavailable as e:
+            logger.error(e)
+            return self.send_service_unavailable_response(message=ResponseMessages.OTP_SERVICE_UNAVAILABLE)
         except Exception as e:
             print(e)
         return self.send_success_response(
@@ -112,7 +150,8 @@ class SignInView(BaseAPIView):
                 {
                     "success": true,
                     "payload": {
-                        "token": "jwt-token"
+                        "token": "jwt-token",
+                        "refresh_token": "jwt-refresh-token"
                     },
                     "message": "Logged in successfully."
                 }
@@ -120,18 +159,20 @@ class SignInView(BaseAPIView):
 
         serializer_login = self.serializer_class(data=request.data)
         if not serializer_login.is_valid():
-            logger.error(serializer_login.errors)
-            return self.send_bad_request_response(
-                message=get_first_error_message_from_serializer_errors(
-                    serialized_errors=serializer_login.errors,
-                    default_message=ResponseMessages.SOMETHING_MISSING_IN_REQUEST,
-                )
+            return self.send_invalid_login_response(serializer_login)
+        return self.login(serializer_login.validated_data["user"], serializer_login.validated_data["fcm_token"])
+
+    def send_invalid_login_response(self, serializer_login):
+        logger.error(serializer_login.errors)
+        return self.send_bad_request_response(
+            message=get_first_error_message_from_serializer_errors(
+                serialized_errors=serializer_login.errors,
+                default_message=ResponseMessages.SOMETHING_MISSING_IN_REQUEST,
             )
-
-        user = authenticate(
-            phone_number=request.data.get("phone_number"),
-            password=request.data.get("password"),
         )
+
+    def login(self, user, fcm_token):
+        """Tokens for an authenticated user, or 401 when user is None"""
         if not user:
             return self.send_response(
                 success=False,
@@ -139,16 +180,33 @@ class SignInView(BaseAPIView):
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
 
-        token = user.get_access_token()
-        user.fcm_token = request.data.get("fcm_token")
-        user.save()
+        tokens = user.get_tokens()
+        if user.fcm_token != fcm_token:
+            user.fcm_token = fcm_token
+            user.save(update_fields=["fcm_token", "modified_at"])
         return self.send_success_response(
-            message=ResponseMessages.LOGGED_IN_SUCCESSFULLY, payload={"token": token,
+            message=ResponseMessages.LOGGED_IN_SUCCESSFULLY, payload={**tokens,
                                                                       "fullname": user.fullname,
                                                                       "email": user.email,
                                                                       "phone_number": user.phone_number,
                                                                       "city":user.userprofile.city})
-        
+
+
+class AsyncSignInView(AsyncBaseAPIView, SignInView):
+    """SignInView for ASGI: the password hash is awaited instead of holding
+    a thread, see users/passwords.py
+    """
+    serializer_class = AsyncLoginSerializer
+
+    async def post(self, request, *args, **kwargs):
+        serializer_login = self.serializer_class(data=request.data)
+        if not await database_sync_to_async(serializer_login.is_valid)():
+            return self.send_invalid_login_response(serializer_login)
+        user = serializer_login.validated_data["user"]
+        if not await check_login_password_async(user, serializer_login.validated_data["password"]):
+            user = None
+        return await database_sync_to_async(self.login)(user, serializer_login.validated_data["fcm_token"])
+
 
 class ForgetPasswordAPIView(BaseAPIView):
     """Forget Password APIView for user"""
@@ -182,11 +240,17 @@ class ForgetPasswordAPIView(BaseAPIView):
             )
         try:
             phone_number = request.data.get("phone_number")
-            service_id = send_phone_number_verification_sms(phone_number)
+            service_id = get_otp_backend().send(phone_number, PhoneNumberOTPTypeChoices.forgot_password_otp)
             user = User.objects.filter(phone_number = phone_number).first()
             PhoneNumberOTP.objects.update_or_create(user=user,
                                                              otp_type=PhoneNumberOTPTypeChoices.forgot_password_otp,
-                                                    defaults = {'twilio_service_id': service_id.sid})
+                                                    defaults = {'twilio_service_id': service_id})
+        except OTPRateLimitExceeded as e:
+            logger.warning(e)
+            return self.send_bad_request_response(message=ResponseMessages.OTP_RATE_LIMITED)
+        except ProviderUnavailable as e:
+            logger.error(e)
+            return self.send_service_unavailable_response(message=ResponseMessages.OTP_SERVICE_UNAVAILABLE)
         except Exception as e:
             print(e)
         return self.send_success_response(
@@ -219,7 +283,12 @@ class VerifyOTPAPIView(BaseAPIView):
         """
         payload = {}
         verify_otp_serializer = self.serializer_class(data=request.data)
-        if not verify_otp_serializer.is_valid():
+        try:
+            is_valid = verify_otp_serializer.is_valid()
+        except ProviderUnavailable as e:
+            logger.error(e)
+            return self.send_service_unavailable_response(message=ResponseMessages.OTP_SERVICE_UNAVAILABLE)
+        if not is_valid:
             logger.error(verify_otp_serializer.errors)
             return self.send_bad_request_response(
                 message=get_first_error_message_from_serializer_errors(
@@ -261,8 +330,7 @@ class VerifyOTPAPIView(BaseAPIView):
             message = ResponseMessages.PHONE_NUMBER_CHANGED,
             instance.delete()
 
-        token = user.get_access_token()
-        payload.update({"token": token})
+        payload.update(user.get_tokens())
         return self.send_success_response( message=message, payload=payload)
 
 
@@ -307,7 +375,9 @@ class ResetPasswordAPIView(BaseAPIView):
                 )
             )
         reset_password_serializer.save()
-        return self.send_success_response(message=ResponseMessages.PASSWORD_RESET)
+        revoke_request_tokens(request)
+        return self.send_success_response(message=ResponseMessages.PASSWORD_RESET,
+                                          payload=request.user.get_tokens())
 
 
 class ProfileView(BaseAPIView):
@@ -374,13 +444,16 @@ class EmailView(BaseAPIView):
         email= request.data.get("email")
         if User.objects.filter(email=email).exists():
             return self.send_bad_request_response(message="email already exists")
-        otp = generate_six_length_random_number()
         try:
-            send_mail("GEMNINE TECH OTP: ", otp, EMAIL_HOST_USER, [email])
+            get_email_otp_backend().send(email, EMAIL_CHANGE_OTP, channel=EMAIL)
+        except OTPRateLimitExceeded as e:
+            logger.warning(e)
+            return self.send_bad_request_response(message=ResponseMessages.OTP_RATE_LIMITED)
         except Exception as e:
-            print(e)
-        TempUserEmail.objects.update_or_create(user=request.user, defaults={"otp":otp,
-                                                                            "email":email})
+            # Without the OTP the new email could never be verified.
+            logger.exception(e)
+            return self.send_service_unavailable_response(message=ResponseMessages.OTP_SERVICE_UNAVAILABLE)
+        TempUserEmail.objects.update_or_create(user=request.user, defaults={"email":email})
         return self.send_success_response(message=ResponseMessages.EMAIL_OTP_SENT)
 
 
@@ -395,15 +468,17 @@ class VerifyEmailOTPView(BaseAPIView):
             return self.send_bad_request_response(message="OTP is missing")
 
         if not TempUserEmail.objects.filter(email=request.data.get("email"),
-                                            otp=request.data.get("otp"),
                                             user=request.user).exists():
             return self.send_bad_request_response(message="invalid otp.")
+        if not get_email_otp_backend().verify(request.data.get("email"), EMAIL_CHANGE_OTP,
+                                              str(request.data.get("otp"))):
+            return self.send_bad_request_response(message="invalid otp.")
         
         request.user.email = request.data.get("email")
         request.user.save()
-        token = request.user.get_access_token()
+        revoke_request_tokens(request)
         return self.send_success_response(message=ResponseMessages.EMAIL_CHANGED,
-                                          payload={"token": token})
+                                          payload=request.user.get_tokens())
 
 
 class PasswordAPIView(BaseAPIView):
@@ -441,7 +516,9 @@ class PasswordAPIView(BaseAPIView):
             )
         request.user.set_password(reset_password_serializer.validated_data["new_password"])
         request.user.save()
-        return self.send_success_response(message=ResponseMessages.PASSWORD_RESET)
+        revoke_request_tokens(request)
+        return self.send_success_response(message=ResponseMessages.PASSWORD_RESET,
+                                          payload=request.user.get_tokens())
 
 
 class PhoneNumberView(BaseAPIView):
@@ -461,15 +538,72 @@ class PhoneNumberView(BaseAPIView):
                 )
             )
             phone_number = serializer_data.validated_data["phone_number"]
-            service_id = send_phone_number_verification_sms(phone_number)
+            service_id = get_otp_backend().send(phone_number, PhoneNumberOTPTypeChoices.change_number_otp)
             PhoneNumberOTP.objects.update_or_create(user=request.user, otp_type = PhoneNumberOTPTypeChoices.change_number_otp,
                                                     defaults={
-                                                        "twilio_service_id": service_id.sid,
+                                                        "twilio_service_id": service_id,
                                                         "phone_number": phone_number
                                                         }
                                                     )
+        except OTPRateLimitExceeded as e:
+            logger.warning(e)
+            return self.send_bad_request_response(message=ResponseMessages.OTP_RATE_LIMITED)
+        except ProviderUnavailable as e:
+            logger.error(e)
+            return self.send_service_unavailable_response(message=ResponseMessages.OTP_SERVICE_UNAVAILABLE)
         except Exception as e:
             print(e)
         return self.send_success_response(
             message=ResponseMessages.PHONE_NUMBER_OTP_SENT
         )
+
+
+class RefreshTokenView(BaseAPIView):
+    """Exchange a refresh token for a new access token"""
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        """
+        API URL: http://baseurl/users/refresh-token/
+        Request Body:
+            {
+                "refresh_token": "jwt-refresh-token"
+            }
+        Response Body:
+            {
+                "success": true,
+                "payload": {"token": "jwt-token"},
+                "message": "Token refreshed successfully."
+            }
+        """
+        if not request.data.get("refresh_token"):
+            return self.send_bad_request_response(message=ResponseMessages.REFRESH_TOKEN_MISSING)
+        payload = decode_token(request.data["refresh_token"], REFRESH_TOKEN)
+        user = get_token_user(payload)
+        if user is None or not user.is_active:
+            return self.send_response(
+                success=False,
+                message=ResponseMessages.INVALID_REFRESH_TOKEN,
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+        return self.send_success_response(message=ResponseMessages.TOKEN_REFRESHED,
+                                          payload={"token": user.get_access_token()})
+
+
+class ProviderStatusView(BaseAPIView):
+    """Latency and circuit breaker state of the third party providers in this process"""
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        """
+        API URL: http://baseurl/users/provider-status/
+        Response Body:
+            {
+                "success": true,
+                "payload": [{"provider": "twilio", "calls": 12, "errors": 0, ...,
+                             "circuit": {"state": "closed", "window_calls": 3, "window_failures": 0}}],
+                "message": "Success."
+            }
+        """
+        return self.send_success_response(message=ResponseMessages.SUCCESS, payload=get_all_provider_metrics())
@@ -0,0 +1,162 @@
+"""Process-wide pooled HTTP sessions for the third party providers.
+
+Every provider (twilio, fcm, ...) gets one keep-alive ``requests`` session
+with a bounded connection pool and default connect/read timeouts, shared by
+all threads of the process. Calls go through the provider's circuit breaker
+and current deadline (utils/provider_guard.py). Call latencies and breaker
+states can be read with ``get_all_provider_metrics``.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.provider_guard import DeadlineExceeded, ProviderUnavailable, get_circuit_breaker, get_remaining_time
+
+logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
+
+DEFAULT_TRANSPORT = {
+    "connect_timeout": 3.05,
+    "read_timeout": 10,
+    "pool_connections": 4,
+    "pool_maxsize": 10,
+    # Retries on connection errors only; requests that reached the
+    # provider are never replayed.
+    "connect_retries": 1,
+}
+
+
+class ProviderMetrics:
+    """Thread safe call counters and latency samples of one provider."""
+
+    def __init__(self, provider, sample_size=1000):
+        self.provider = provider
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=sample_size)
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, error=False):
+        with self.lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.samples.append(seconds)
+
+    def percentile(self, samples, percent):
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            return {
+                "provider": self.provider,
+                "calls": self.calls,
+                "errors": self.errors,
+                "average_seconds": self.total_seconds / self.calls if self.calls else None,
+                "max_seconds": self.max_seconds,
+                "p50_seconds": self.percentile(samples, 50),
+                "p95_seconds": self.percentile(samples, 95),
+            }
+
+
+class InstrumentedSession(requests.Session):
+    """Session with a bounded pool, default timeouts and latency metrics."""
+
+    def __init__(self, provider, connect_timeout, read_timeout, pool_connections, pool_maxsize, connect_retries):
+        super().__init__()
+        self.provider = provider
+        self.timeout = (connect_timeout, read_timeout)
+        self.metrics = get_provider_metrics(provider)
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=connect_retries, connect=connect_retries, read=False, status=0, redirect=False),
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def get_timeout(self, timeout):
+        """The call's (connect, read) timeout clamped to the current deadline."""
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        remaining = get_remaining_time()
+        if remaining is None:
+            return connect_timeout, read_timeout
+        if remaining <= 0:
+            raise DeadlineExceeded(self.provider, "deadline exceeded before the call")
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+    def send(self, request, **kwargs):
+        kwargs["timeout"] = self.get_timeout(kwargs.get("timeout") or self.timeout)
+        breaker = get_circuit_breaker(self.provider)
+        breaker.before_call()
+        started_at = time.monotonic()
+        error = True
+        try:
+            response = super().send(request, **kwargs)
+            error = response.status_code >= 500
+            return response
+        except (requests.Timeout, requests.ConnectionError) as err:
+            raise ProviderUnavailable(self.provider, f"{type(err).__name__}: {err}") from err
+        finally:
+            elapsed = time.monotonic() - started_at
+            breaker.record(not error)
+            self.metrics.record(elapsed, error=error)
+            logger.debug(f"{self.provider} {request.method} {request.url} took {elapsed:.3f}s")
+
+
+_lock = threading.Lock()
+_sessions = {}
+_metrics = {}
+_pid = os.getpid()
+
+
+def get_transport_settings(provider):
+    transport = dict(DEFAULT_TRANSPORT)
+    transport.update(settings.PROVIDER_TRANSPORTS.get(provider, {}))
+    return transport
+
+
+def get_provider_metrics(provider):
+    with _lock:
+        if provider not in _metrics:
+            _metrics[provider] = ProviderMetrics(provider)
+        return _metrics[provider]
+
+
+def get_session(provider):
+    """The process-wide pooled session of a provider."""
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Pooled sockets must not be shared with a forked worker.
+            _sessions.clear()
+            _pid = os.getpid()
+        session = _sessions.get(provider)
+    if session is None:
+        session = InstrumentedSession(provider, **get_transport_settings(provider))
+        with _lock:
+            session = _sessions.setdefault(provider, session)
+    return session
+
+
+def get_all_provider_metrics():
+    with _lock:
+        providers = list(_metrics)
+    snapshots = []
+    for provider in providers:
+        snapshot = get_provider_metrics(provider).snapshot()
+        snapshot["circuit"] = get_circuit_breaker(provider).snapshot()
+        snapshots.append(snapshot)
+    return snapshots
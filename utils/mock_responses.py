@@ -8,12 +8,17 @@ class ResponseMessages(str, Enum):
     INVALID_PHONE_NUMBER = "Invalid phone number."
     IN_VALID_PHONE_NUMBER_OR_PASSWORD = "Invalid phone number or password."
     LOGGED_IN_SUCCESSFULLY = "Logged in successfully."
+    TOKEN_REFRESHED = "Token refreshed successfully."
+    REFRESH_TOKEN_MISSING = "Refresh token is missing."
+    INVALID_REFRESH_TOKEN = "Invalid refresh token."
     SOMETHING_MISSING_IN_FORGET_PASSWORD_REQUEST = (
         "Something is missing in forget password request body."
     )
     PHONE_NUMBER_OTP_SENT = "Phone number OTP sent successfully."
     EMAIL_OTP_SENT = "OTP has been sent succesfuly sent."
     INVALID_OTP_OR_EXPIRED = "Invalid OTP or expired."
+    OTP_RATE_LIMITED = "Too many OTP requests, please try again later."
+    OTP_SERVICE_UNAVAILABLE = "OTP service is temporarily unavailable, please try again later."
     SOMETHING_MISSING_IN_VERIFY_PASSWORD_REQUEST = (
         "Something is missing in verify password request body."
     )
@@ -37,4 +42,7 @@ class ResponseMessages(str, Enum):
     SUCCESS = "Success."
     INVALID_CATEGORY = "Invalid category."
     INVALID_PROPERTY_ID = "Invalid property id."
+    INVALID_CURSOR = "Invalid cursor."
+    INVALID_FILTER = "Invalid filter value."
+    CITY_MISSING = "City is missing."
     FCM_TOKEN_IS_MISSING = "FCM token is missing."
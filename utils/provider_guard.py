@@ -0,0 +1,147 @@
+"""Deadlines and circuit breakers for third party provider calls.
+
+``InstrumentedSession`` (utils/http_transport.py) checks the provider's
+circuit breaker before every request and clamps its timeouts to the
+deadline set by ``provider_deadline``. Callers get ``ProviderUnavailable``
+instead of blocking a worker while a provider is slow or failing.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(settings.LOGGER_NAME_PREFIX + __name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_BREAKER = {
+    # Failure rate over the last window_seconds that opens the circuit,
+    # once at least minimum_calls were made.
+    "failure_rate": 0.5,
+    "minimum_calls": 5,
+    "window_seconds": 30,
+    # Time the circuit stays open before half-open probes are let through.
+    "open_seconds": 15,
+    "half_open_calls": 1,
+}
+
+_deadline = contextvars.ContextVar("provider_deadline", default=None)
+
+
+class ProviderUnavailable(Exception):
+    """The provider can't be called now: failing, too slow or circuit open."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider}: {reason}")
+        self.provider = provider
+
+
+class CircuitOpen(ProviderUnavailable):
+    pass
+
+
+class DeadlineExceeded(ProviderUnavailable):
+    pass
+
+
+@contextmanager
+def provider_deadline(seconds):
+    """Bound the total time of the provider calls made inside the block."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time():
+    """Seconds left before the current deadline, None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Rolling window failure-rate circuit breaker with half-open probing."""
+
+    def __init__(self, provider, failure_rate, minimum_calls, window_seconds, open_seconds, half_open_calls):
+        self.provider = provider
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.lock = threading.Lock()
+        self.calls = deque()
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes = 0
+
+    def set_state(self, state):
+        if state != self.state:
+            logger.warning(f"{self.provider} circuit {self.state} -> {state}")
+        self.state = state
+        self.probes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state == CLOSED:
+            self.calls.clear()
+
+    def before_call(self):
+        """Reserve a call or raise CircuitOpen."""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.set_state(HALF_OPEN)
+            if self.state == OPEN:
+                raise CircuitOpen(self.provider, "circuit open")
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    raise CircuitOpen(self.provider, "circuit half open, probe in flight")
+                self.probes += 1
+
+    def record(self, success):
+        now = time.monotonic()
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.set_state(CLOSED if success else OPEN)
+                return
+            self.calls.append((now, success))
+            while self.calls and self.calls[0][0] < now - self.window_seconds:
+                self.calls.popleft()
+            failures = sum(1 for _, call_success in self.calls if not call_success)
+            if (
+                self.state == CLOSED
+                and len(self.calls) >= self.minimum_calls
+                and failures / len(self.calls) >= self.failure_rate
+            ):
+                self.set_state(OPEN)
+
+    def snapshot(self):
+        with self.lock:
+            failures = sum(1 for _, success in self.calls if not success)
+            return {"state": self.state, "window_calls": len(self.calls), "window_failures": failures}
+
+
+_lock = threading.Lock()
+_breakers = {}
+
+
+def get_circuit_breaker(provider):
+    with _lock:
+        if provider not in _breakers:
+            options = dict(DEFAULT_BREAKER)
+            options.update(settings.PROVIDER_CIRCUIT_BREAKERS.get(provider, {}))
+            _breakers[provider] = CircuitBreaker(provider, **options)
+        return _breakers[provider]
+
+
+def reset_circuit_breakers():
+    with _lock:
+        _breakers.clear()
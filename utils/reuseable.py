@@ -1,7 +1,11 @@
+
 import random
+import threading
 from pyfcm import FCMNotification
 from gemnineDealerBackend.settings import FCM_API_KEY
-from user_deals.models import Property, PropertyPurpose
+from utils.http_transport import get_session
+
+_push_services = threading.local()
 
 
 #gemnine method reuseablity
@@ -10,42 +14,41 @@ def generate_six_length_random_number():
     return str(random_otp)
 
 #Firebase notification method
-def send_firebase_notification(message_title, message_body, registration_ids, extra_notification_kwargs=None):
-    try:
+def get_push_service():
+    """FCMNotification of the current thread, sending through the shared "fcm" session.
+    pyfcm keeps the last responses on the instance, so instances are not
+    shared between threads; the pooled session is.
+    """
+    push_service = getattr(_push_services, "push_service", None)
+    session = get_session("fcm")
+    if push_service is None or push_service.requests_session is not session:
         push_service = FCMNotification(api_key=FCM_API_KEY)
-        response = push_service.notify_multiple_devices(registration_ids=registration_ids,
-                                             message_body = message_body, message_title=message_title,
-                                             extra_notification_kwargs = extra_notification_kwargs,
-                                             sound = "gemnine-notification-sound.caf")
-        return response
-    except Exception as e:
-        print(f"Error in sending notification: {e}")
+        session.headers.update(push_service.request_headers())
+        push_service.requests_session = session
+        _push_services.push_service = push_service
+    return push_service
+
+def send_firebase_multicast(message_title, message_body, registration_ids, extra_notification_kwargs=None):
+    """Send one multicast notification, raising the pyfcm errors on failure."""
+    push_service = get_push_service()
+    return push_service.notify_multiple_devices(registration_ids=registration_ids,
+                                                message_body=message_body, message_title=message_title,
+                                                extra_notification_kwargs=extra_notification_kwargs,
+                                                sound="gemnine-notification-sound.caf",
+                                                timeout=push_service.requests_session.timeout)
 
-def configure_firebase_notification(ticket):
-    if ticket.purpose == "sale":
-        purpose = "required"
-    else:
-        purpose = "sale"
-    fcm_token_list = Property.objects.filter(type=ticket.type,
-                                             city__icontains=ticket.city,
-                                             location__icontains=ticket.location,
-                                             purpose = purpose)\
-                                    .exclude(id=ticket.id)\
-                                    .values_list('user__fcm_token', flat=True)
-    fcm_token_list = list(dict().fromkeys(fcm_token_list))
-    if len(fcm_token_list) > 0:
-        extra_notification_kwargs = {
+def get_deal_notification(ticket):
+    """Title, body and extra kwargs of the "similar deal" notification for a ticket."""
+    return {
+        "message_title": "Similar deal available",
+        "message_body": ticket.title,
+        "extra_notification_kwargs": {
             "sound": "gemnine-notification-sound.caf",
             "badge": "1",
             "click_action": "FCM_PLUGIN_ACTIVITY",
             "icon": "fcm_push_icon",
             "tag": "gemnine-notification-tag",
             "color": "red",
-            "ticket_id": ticket.id
-        }
-    send_firebase_notification(
-        message_title="Similar deal available",
-        message_body=ticket.title,
-        registration_ids=fcm_token_list,
-        extra_notification_kwargs=extra_notification_kwargs
-    )
+            "ticket_id": str(ticket.id)
+        },
+    }
@@ -1,32 +1,108 @@
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
-from gemnineDealerBackend.settings import (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+from gemnineDealerBackend.settings import (
+    TWILIO_ACCOUNT_SID,
+    TWILIO_API_BASE_URL,
+    TWILIO_AUTH_TOKEN,
+    TWILIO_CALL_DEADLINE_SECONDS,
+    TWILIO_VERIFY_SERVICE_SID,
+)
+from utils.http_transport import get_session
+from utils.provider_guard import provider_deadline
 
 COMPANY_NAME = "Gemnine Technologies"
 
 
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """Twilio http client sending through the shared "twilio" session."""
+
+    def __init__(self, **kwargs):
+        super().__init__(pool_connections=False, **kwargs)
+        self.session = get_session("twilio")
+
+    def request(self, method, url, *args, **kwargs):
+        if TWILIO_API_BASE_URL:
+            # Send every twilio domain to one base url, e.g. a local fake server.
+            base_url = urlsplit(TWILIO_API_BASE_URL)
+            url = urlunsplit(urlsplit(url)._replace(scheme=base_url.scheme, netloc=base_url.netloc))
+        return super().request(method, url, *args, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
 def get_twilio_client():
-    """Get twilio client using TWILIO_ACCOUNT_SID, and TWILIO_AUTH_TOKEN"""
-    return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    """Get the process-wide twilio client using TWILIO_ACCOUNT_SID, and TWILIO_AUTH_TOKEN"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=PooledTwilioHttpClient())
+    return _client
+
+
+_verify_service_sid = None
+_verify_service_lock = threading.Lock()
 
 
-client = get_twilio_client()
+def find_or_create_verify_service():
+    """Sid of the Verify service named COMPANY_NAME, created when missing"""
+    client = get_twilio_client()
+    for service in client.verify.services.stream(page_size=50):
+        if service.friendly_name == COMPANY_NAME:
+            return service.sid
+    return client.verify.services.create(friendly_name=COMPANY_NAME).sid
+
+
+def get_verify_service_sid():
+    """Verify service used for every OTP: TWILIO_VERIFY_SERVICE_SID, or looked
+    up (and created if needed) once per process
+    """
+    global _verify_service_sid
+    if TWILIO_VERIFY_SERVICE_SID:
+        return TWILIO_VERIFY_SERVICE_SID
+    if _verify_service_sid is None:
+        with _verify_service_lock:
+            if _verify_service_sid is None:
+                _verify_service_sid = find_or_create_verify_service()
+    return _verify_service_sid
+
+
+def forget_verify_service(service_sid):
+    global _verify_service_sid
+    with _verify_service_lock:
+        if _verify_service_sid == service_sid:
+            _verify_service_sid = None
 
 
 def send_phone_number_verification_sms(phone_number):
     """Send phone number verification code sms
     :param phone_number
-    :return service
-    :return custom_friendly_name
+    :return sid of the verify service that sent the code
+    :raise ProviderUnavailable when twilio is failing or slower than TWILIO_CALL_DEADLINE_SECONDS
     """
-    service = client.verify.services.create(friendly_name=COMPANY_NAME)
-    client.verify.services(service.sid).verifications.create(
-        to=phone_number, channel="sms"
-    )
-    return service
+    with provider_deadline(TWILIO_CALL_DEADLINE_SECONDS):
+        service_sid = get_verify_service_sid()
+        try:
+            get_twilio_client().verify.services(service_sid).verifications.create(to=phone_number, channel="sms")
+        except TwilioRestException as err:
+            # The looked up service was deleted on twilio; look it up again once.
+            if err.status != 404 or TWILIO_VERIFY_SERVICE_SID:
+                raise
+            forget_verify_service(service_sid)
+            service_sid = get_verify_service_sid()
+            get_twilio_client().verify.services(service_sid).verifications.create(to=phone_number, channel="sms")
+    return service_sid
 
 
 def verify_phone_number_with_otp(service_id, phone_number, otp):
-    return client.verify.services(service_id).verification_checks.create(to=phone_number, code=otp)
+    with provider_deadline(TWILIO_CALL_DEADLINE_SECONDS):
+        return get_twilio_client().verify.services(service_id).verification_checks.create(to=phone_number, code=otp)
 
 """def send_email_verification_code(email):
 